@@ -5,10 +5,16 @@ Combine la détection de balle et la détection de posture pour classifier les a
 import cv2
 import mediapipe as mp
 import numpy as np
-import math
+import sys
 from collections import deque
-import time
-from ball_tracking import BallTracker
+from concurrent.futures import ThreadPoolExecutor
+from mediapipe.framework.formats import landmark_pb2
+from ball_tracking import AdaptiveStride, BallTracker, read_only_view
+from motion_detection import MotionDetector
+from pose_backends import DEFAULT_POSE_PROFILE, PoseEstimate, create_pose
+# calculate_angle reste importable depuis ce module (géométrie partagée: pose_geometry)
+from pose_geometry import calculate_angle, joint_angles, landmarks_to_array, pose_features
+from tracking_output import tracking_record
 
 
 def calculate_distance(point1, point2):
@@ -24,51 +30,144 @@ def calculate_distance(point1, point2):
     return np.sqrt((point1[0] - point2[0])**2 + (point1[1] - point2[1])**2)
 
 
-def calculate_angle(a, b, c):
+def array_to_landmarks(points):
     """
-    Calcule l'angle au point b formé par les points a, b, c
+    Convertit un tableau (33, 4) en NormalizedLandmarkList (dessinable par MediaPipe)
+    """
+    landmark_list = landmark_pb2.NormalizedLandmarkList()
+    for x, y, z, visibility in points:
+        landmark_list.landmark.add(x=x, y=y, z=z, visibility=visibility)
+    return landmark_list
+
+
+def extrapolate_landmarks(history, timestamp):
+    """
+    Estime les landmarks à l'instant timestamp à partir des dernières postures détectées
     
     Args:
-        a, b, c: Points avec attributs x, y (landmarks MediaPipe)
+        history: Liste de (instant, tableau (33, 4)), de la plus ancienne à la plus récente
+        timestamp: Instant de la frame à estimer
     
     Returns:
-        Angle en degrés (0-180)
+        Tableau (33, 4): extrapolation linéaire (vitesse constante) des positions,
+        visibilité de la dernière détection; dernière posture si un seul point
     """
-    ba = np.array([a.x - b.x, a.y - b.y])
-    bc = np.array([c.x - b.x, c.y - b.y])
+    last_time, last_points = history[-1]
+    if len(history) < 2:
+        return last_points
     
-    dot_product = np.dot(ba, bc)
-    norm_ba = np.linalg.norm(ba)
-    norm_bc = np.linalg.norm(bc)
+    previous_time, previous_points = history[-2]
+    elapsed = last_time - previous_time
+    if elapsed <= 0:
+        return last_points
     
-    if norm_ba == 0 or norm_bc == 0:
-        return 0
+    points = last_points.copy()
+    points[:, :3] += (last_points[:, :3] - previous_points[:, :3]) * ((timestamp - last_time) / elapsed)
+    return points
+
+
+def player_box(points, frame_shape, padding=0.3):
+    """
+    Rectangle du joueur (x0, y0, x1, y1) en pixels
     
-    cosine_angle = dot_product / (norm_ba * norm_bc)
-    cosine_angle = np.clip(cosine_angle, -1.0, 1.0)
-    angle = np.arccos(cosine_angle)
+    Args:
+        points: Landmarks normalisés, tableau (33, 4)
+        frame_shape: Dimensions de la frame
+        padding: Marge ajoutée de chaque côté, en fraction de la plus grande
+                 dimension du joueur (bras et crosse tendus)
     
-    return np.degrees(angle)
+    Returns:
+        Rectangle limité à la frame, ou None s'il est vide
+    """
+    frame_h, frame_w = frame_shape[:2]
+    xs = points[:, 0] * frame_w
+    ys = points[:, 1] * frame_h
+    pad = max(xs.max() - xs.min(), ys.max() - ys.min()) * padding
+    x0 = max(0, int(xs.min() - pad))
+    y0 = max(0, int(ys.min() - pad))
+    x1 = min(frame_w, int(xs.max() + pad) + 1)
+    y1 = min(frame_h, int(ys.max() + pad) + 1)
+    if x1 - x0 < 2 or y1 - y0 < 2:
+        return None
+    return (x0, y0, x1, y1)
 
 
 class ActionRecognizer:
-    def __init__(self):
+    def __init__(self, idle_stride=1, motion_gate=False, concurrent=False, pose_interval=1,
+                 pose_trigger_distance=300, pose_crop=False, pose_crop_padding=0.3,
+                 pose_profile=DEFAULT_POSE_PROFILE):
         """
         Initialise le système de reconnaissance d'actions
+        
+        Args:
+            idle_stride: Sans balle, n'analyser qu'une frame sur idle_stride
+                         (1 = toutes les frames, voir AdaptiveStride)
+            motion_gate: Si True, la segmentation de la balle et la posture ne
+                         tournent que sur les frames (ou zones) en mouvement
+            concurrent: Si True, la posture (MediaPipe) tourne dans un thread pendant
+                        la détection de balle (OpenCV et MediaPipe libèrent le GIL):
+                        la latence par frame devient le maximum des deux étapes
+            pose_interval: MediaPipe ne tourne qu'une frame sur pose_interval (1 = toutes);
+                           entre deux détections, les landmarks sont extrapolés et la
+                           balle reste suivie à chaque frame
+            pose_trigger_distance: Balle à moins de cette distance (pixels) du joueur =
+                                   posture détectée à chaque frame (tir, passe)
+            pose_crop: Si True, MediaPipe ne reçoit que le rectangle du joueur (d'après
+                       les landmarks précédents), toute la frame s'il est perdu
+            pose_crop_padding: Marge autour du joueur, en fraction de sa taille
+            pose_profile: Modèle de posture (lite, full, heavy, ou none pour le suivi
+                          de balle seul), voir pose_backends.POSE_PROFILES
         """
         # MediaPipe Pose pour la détection de posture
         self.mp_pose = mp.solutions.pose
         self.mp_drawing = mp.solutions.drawing_utils
         self.mp_drawing_styles = mp.solutions.drawing_styles
-        self.pose = self.mp_pose.Pose(
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5,
-            model_complexity=1
-        )
+        self.pose_profile = pose_profile
+        self.pose = create_pose(pose_profile)
         
         # Utiliser le BallTracker amélioré avec détection de balle jaune
         self.ball_tracker = BallTracker(max_positions=30)
         
+        # Tampon RGB réutilisé d'une frame à l'autre pour MediaPipe (frame entière
+        # ou rectangle du joueur)
+        self.rgb_buffer = None
+        
+        # Recadrage optionnel de l'entrée de MediaPipe sur le joueur
+        self.pose_crop = pose_crop
+        self.pose_crop_padding = pose_crop_padding
+        self.player_box = None
+        self.pose_reacquisitions = 0
+        
+        # Pas adaptatif optionnel: sans balle, frames analysées une sur idle_stride
+        self.stride = AdaptiveStride(idle_stride) if idle_stride > 1 else None
+        self.frame_count = 0
+        
+        # Pré-filtre de mouvement partagé avec le BallTracker (un seul calcul par frame):
+        # sur une frame immobile, la posture précédente est réutilisée
+        self.motion_gate = None
+        if motion_gate:
+            self.motion_gate = MotionDetector(min_area=self.ball_tracker.min_area)
+            self.ball_tracker.motion_gate = self.motion_gate
+        self.last_pose_results = None
+        self.last_pose_points = None  # Landmarks de last_pose_results en tableau (33, 4)
+        
+        # Posture à fréquence réduite: détections réelles récentes (instant, landmarks)
+        # pour l'extrapolation, et dernières positions du joueur et de la balle
+        self.pose_interval = max(1, int(pose_interval))
+        self.pose_trigger_distance = pose_trigger_distance
+        self.pose_history = deque(maxlen=2)
+        self.last_pose_frame = None
+        self.last_player_pos = None
+        self.last_ball_pos = None
+        self.pose_runs = 0
+        self.pose_estimates = 0
+        
+        # Thread dédié à la posture en mode concurrent (un seul: MediaPipe n'est pas réentrant)
+        self.pose_executor = ThreadPoolExecutor(max_workers=1) if concurrent else None
+        
+        # Export optionnel des résultats frame par frame (tracking_output.TrackingWriter)
+        self.tracking_writer = None
+        
         # Historique pour l'analyse temporelle (positions gérées par BallTracker)
         self.ball_speeds = deque(maxlen=10)
         
@@ -82,17 +181,119 @@ class ActionRecognizer:
         self.pass_min_speed = 20  # km/h
         self.shoot_min_speed = 50  # km/h
         
-    def detect_ball(self, frame):
+    def detect_ball(self, frame, timestamp=None):
         """
         Détecte la balle dans la frame en utilisant le BallTracker amélioré
         
+        Args:
+            frame: Frame BGR d'OpenCV
+            timestamp: Instant de capture en secondes (None = heure de traitement)
+        
         Returns:
             (x, y, radius) ou None si non trouvée
         """
         # Utiliser le BallTracker avec détection optimisée pour balle jaune
-        position, mask = self.ball_tracker.update(frame)
+        position, mask = self.ball_tracker.update(frame, timestamp)
         return position
     
+    def detect_pose(self, frame):
+        """
+        Détecte la posture du joueur avec MediaPipe
+        
+        Args:
+            frame: Frame BGR d'OpenCV (lue sans être modifiée)
+        
+        Returns:
+            (résultats MediaPipe, landmarks en tableau (33, 4) ou None si aucun joueur)
+        """
+        if self.pose_profile == "none":
+            # Suivi de balle seul: ni conversion RGB ni inférence
+            return PoseEstimate(None), None
+        if (self.motion_gate is not None and not self.motion_gate.moving
+                and self.last_pose_results is not None):
+            # Frame immobile: même posture
+            return self.last_pose_results, self.last_pose_points
+        
+        box = self.player_box if self.pose_crop else None
+        pose_results, points = self.process_pose(frame, box)
+        if box is not None and points is None:
+            # Joueur perdu dans le rectangle: nouvelle recherche sur toute la frame
+            self.pose_reacquisitions += 1
+            pose_results, points = self.process_pose(frame)
+        
+        if self.pose_crop:
+            self.player_box = None
+            if points is not None:
+                self.player_box = player_box(points, frame.shape, self.pose_crop_padding)
+        self.last_pose_results = pose_results
+        self.last_pose_points = points
+        return pose_results, points
+    
+    def process_pose(self, frame, box=None):
+        """
+        Lance MediaPipe sur la frame, ou seulement sur le rectangle box (x0, y0, x1, y1);
+        les landmarks sont ramenés en coordonnées normalisées de la frame entière
+        Retourne (résultats MediaPipe, landmarks en tableau (33, 4) ou None): la seule
+        conversion des landmarks de la frame, réutilisée par les autres étapes
+        """
+        image = frame if box is None else frame[box[1]:box[3], box[0]:box[2]]
+        if self.rgb_buffer is None or self.rgb_buffer.size < image.size:
+            self.rgb_buffer = np.empty_like(frame)
+        # Vue contiguë du tampon aux dimensions de l'image
+        rgb = self.rgb_buffer.reshape(-1)[:image.size].reshape(image.shape)
+        cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=rgb)
+        rgb.flags.writeable = False
+        pose_results = self.pose.process(rgb)
+        
+        if box is not None and pose_results.pose_landmarks:
+            frame_h, frame_w = frame.shape[:2]
+            height, width = image.shape[:2]
+            for landmark in pose_results.pose_landmarks.landmark:
+                landmark.x = (box[0] + landmark.x * width) / frame_w
+                landmark.y = (box[1] + landmark.y * height) / frame_h
+                landmark.z = landmark.z * width / frame_w  # z suit l'échelle de x
+        
+        points = None
+        if pose_results.pose_landmarks:
+            points = landmarks_to_array(pose_results.pose_landmarks.landmark)
+        return pose_results, points
+    
+    def should_run_pose(self):
+        """
+        Indique si MediaPipe doit tourner sur la frame courante (mode pose_interval):
+        intervalle écoulé, pas de posture à extrapoler, ou balle près du joueur
+        (décision prise avant les détections, d'après la frame précédente)
+        """
+        if self.pose_interval <= 1 or not self.pose_history:
+            return True
+        if self.frame_count - self.last_pose_frame >= self.pose_interval:
+            return True
+        if self.last_ball_pos is not None and self.last_player_pos is not None:
+            return calculate_distance(self.last_ball_pos, self.last_player_pos) < self.pose_trigger_distance
+        return False
+    
+    def remember_pose(self, points, timestamp):
+        """
+        Enregistre une détection réelle pour les extrapolations suivantes
+        points: landmarks en tableau (33, 4), None si le joueur n'est plus vu
+                (historique vidé)
+        """
+        self.last_pose_frame = self.frame_count
+        self.pose_runs += 1
+        if points is not None:
+            self.pose_history.append((timestamp, points))
+        else:
+            self.pose_history.clear()
+    
+    def estimate_pose(self, timestamp):
+        """
+        Posture extrapolée à l'instant timestamp, sans MediaPipe
+        Retourne (PoseEstimate dessinable, landmarks en tableau (33, 4))
+        """
+        self.pose_estimates += 1
+        points = extrapolate_landmarks(self.pose_history, timestamp)
+        return PoseEstimate(array_to_landmarks(points)), points
+    
     def get_player_center(self, landmarks, image_w, image_h):
         """
         Calcule le centre du joueur (milieu du torse)
@@ -137,13 +338,7 @@ class ActionRecognizer:
             return 180.0
         
         # Bras droit: épaule (12), coude (14), poignet (16)
-        right_shoulder = landmarks[12]
-        right_elbow = landmarks[14]
-        right_wrist = landmarks[16]
-        
-        elbow_angle = calculate_angle(right_shoulder, right_elbow, right_wrist)
-        
-        return elbow_angle
+        return float(joint_angles(landmarks_to_array(landmarks), 12, 14, 16))
     
     def classify_action(self, ball_pos, player_pos, ball_speed, arm_angle, body_lean):
         """
@@ -204,33 +399,59 @@ class ActionRecognizer:
         
         return "AUCUNE", 0.0
     
-    def update(self, frame):
+    def update(self, frame, timestamp=None):
         """
         Met à jour la reconnaissance d'action avec une nouvelle frame
         
         Args:
-            frame: Frame BGR d'OpenCV
+            frame: Frame BGR d'OpenCV, annotée sur place (squelette, balle, joueur);
+                   la copier avant l'appel pour conserver l'image d'origine
+            timestamp: Instant de capture en secondes (temps média); si None,
+                       l'heure de traitement est utilisée
         
         Returns:
-            Tuple (action, confidence, annotated_frame)
+            Tuple (action, confidence, annotated_frame), annotated_frame étant frame
         """
-        current_time = time.time()
+        current_time = self.ball_tracker.resolve_timestamp(timestamp)
         image_h, image_w, _ = frame.shape
         
-        # Copie pour annotation
-        annotated_frame = frame.copy()
-        
-        # 1. Détecter la posture du joueur
-        image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        image_rgb.flags.writeable = False
-        pose_results = self.pose.process(image_rgb)
-        image_rgb.flags.writeable = True
+        # 0. Pas adaptatif: frame sautée, rien à détecter ni à dessiner
+        self.frame_count += 1
+        if self.stride is not None and not self.stride.should_analyze(self.frame_count):
+            self.stride.skip()
+            return "AUCUNE", 0.0, frame
+        
+        # 1. Détections sur la frame encore intacte (aucune copie): la balle sur une
+        #    vue en lecture seule, la posture sur un tampon RGB réutilisé; en mode
+        #    concurrent, la posture tourne dans son thread pendant la détection de balle
+        if self.motion_gate is not None:
+            # Mouvement évalué une seule fois, partagé par la balle et la posture
+            self.motion_gate.detect(frame, frame_id=current_time)
+        run_pose = self.should_run_pose()
+        pose_future = None
+        if run_pose and self.pose_executor is not None:
+            pose_future = self.pose_executor.submit(self.detect_pose, frame)
+        
+        ball_result = self.detect_ball(read_only_view(frame), current_time)
+        if self.stride is not None:
+            self.stride.update(self.frame_count, ball_result is not None)
+        
+        if run_pose:
+            if pose_future is not None:
+                pose_results, points = pose_future.result()
+            else:
+                pose_results, points = self.detect_pose(frame)
+            self.remember_pose(points, current_time)
+        else:
+            pose_results, points = self.estimate_pose(current_time)
         
+        # 2. Annotation sur place, une fois les détections terminées
+        annotated_frame = frame
         player_pos = None
         arm_angle = 180.0
         body_lean = 0.0
         
-        if pose_results.pose_landmarks:
+        if points is not None:
             # Dessiner le squelette
             self.mp_drawing.draw_landmarks(
                 annotated_frame,
@@ -241,20 +462,13 @@ class ActionRecognizer:
             
             landmarks = pose_results.pose_landmarks.landmark
             player_pos = self.get_player_center(landmarks, image_w, image_h)
-            arm_angle = self.get_arm_extension(landmarks)
             
-            # Calculer l'inclinaison du corps
-            right_shoulder = landmarks[12]
-            right_hip = landmarks[24]
-            dx = right_shoulder.x - right_hip.x
-            dy = right_shoulder.y - right_hip.y
-            if dy != 0:
-                body_lean = abs(math.degrees(math.atan(dx / dy)))
-        
-        # 2. Détecter la balle avec le BallTracker amélioré
-        ball_result = self.detect_ball(frame)
-        ball_pos = None
+            # Angles et inclinaison du corps en un seul calcul vectorisé
+            features = pose_features(points)
+            arm_angle = float(features["right_elbow"])
+            body_lean = float(features["torso_lean"])
         
+        ball_pos = None
         if ball_result is not None:
             x, y, radius = ball_result
             ball_pos = (x, y)
@@ -264,6 +478,9 @@ class ActionRecognizer:
             cv2.circle(annotated_frame, (x, y), radius, (0, 255, 0), 2)
             cv2.circle(annotated_frame, (x, y), 5, (0, 0, 255), -1)
         
+        self.last_player_pos = player_pos
+        self.last_ball_pos = ball_pos
+        
         # 3. Calculer la vitesse de la balle
         ball_speed = self.calculate_ball_speed()
         if ball_speed > 0:
@@ -292,6 +509,10 @@ class ActionRecognizer:
         
         self.action_confidence = confidence
         
+        if self.tracking_writer is not None:
+            self.tracking_writer.write(tracking_record(self.ball_tracker, self.frame_count, current_time,
+                                                       ball_result, action, confidence))
+        
         return action, confidence, annotated_frame
     
     def draw_info(self, frame, action, confidence):
@@ -341,6 +562,16 @@ class ActionRecognizer:
         Réinitialise l'état du reconnaisseur
         """
         self.ball_tracker = BallTracker(max_positions=30)
+        if self.motion_gate is not None:
+            self.motion_gate.reset()
+            self.ball_tracker.motion_gate = self.motion_gate
+        self.last_pose_results = None
+        self.last_pose_points = None
+        self.pose_history.clear()
+        self.player_box = None
+        self.last_pose_frame = None
+        self.last_player_pos = None
+        self.last_ball_pos = None
         self.ball_speeds.clear()
         self.current_action = "AUCUNE"
         self.action_confidence = 0.0
@@ -350,16 +581,20 @@ class ActionRecognizer:
         """
         Libère les ressources
         """
+        if self.pose_executor is not None:
+            self.pose_executor.shutdown(wait=True)
         self.pose.close()
 
 
-def main():
+def main(pose_profile=DEFAULT_POSE_PROFILE):
     """
     Programme principal pour tester la reconnaissance d'actions
+    Usage: python action_recognition.py [lite|full|heavy|none]
     """
     print("🏒 Reconnaissance d'Actions - Hockey Trainer")
     print("=" * 60)
     print("Détection: TIR, PASSE, DRIBBLE")
+    print(f"Profil de posture: {pose_profile}")
     print("Touches:")
     print("  - 'q': Quitter")
     print("  - 'r': Réinitialiser")
@@ -374,7 +609,7 @@ def main():
         print("❌ Impossible d'ouvrir la caméra")
         return
     
-    recognizer = ActionRecognizer()
+    recognizer = ActionRecognizer(pose_profile=pose_profile)
     show_ball_params = False
     
     try:
@@ -413,9 +648,11 @@ def main():
                 break
             elif key == ord('r'):
                 recognizer.reset()
+                recognizer.ball_tracker.debug = show_ball_params
                 print("🔄 Reconnaisseur réinitialisé")
             elif key == ord('h'):
                 show_ball_params = not show_ball_params
+                recognizer.ball_tracker.debug = show_ball_params
                 print(f"📋 Paramètres balle: {'Affichés' if show_ball_params else 'Masqués'}")
             # Ajustements de la saturation pour la détection de balle
             elif key == ord('s'):
@@ -440,4 +677,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_POSE_PROFILE)
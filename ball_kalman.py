@@ -0,0 +1,128 @@
+"""
+Modèle de mouvement à accélération constante pour le suivi de balle
+Filtre de Kalman (position, vitesse, accélération) utilisé par BallTracker pour
+lisser la trajectoire, traverser les courtes occlusions et rejeter les faux positifs
+"""
+import cv2
+import numpy as np
+
+
+class BallKalmanFilter:
+    def __init__(self, process_noise=5e5, measurement_noise=4.0, gate_threshold=13.8):
+        """
+        Initialise le filtre
+        process_noise: intensité du bruit de jerk (pixels²/s⁵)
+        measurement_noise: variance de la mesure de position (pixels²)
+        gate_threshold: seuil sur la distance de Mahalanobis² pour rejeter une mesure
+                        (13.8 = chi² à 2 degrés de liberté, 99.9%)
+        """
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.gate_threshold = gate_threshold
+        
+        # Incertitude initiale sur la vitesse (pixels/s) et l'accélération (pixels/s²)
+        self.initial_velocity_std = 2000.0
+        self.initial_acceleration_std = 5000.0
+        
+        # État: [x, y, vx, vy, ax, ay], mesure: [x, y]
+        self.kalman = cv2.KalmanFilter(6, 2)
+        self.kalman.measurementMatrix = np.array([[1, 0, 0, 0, 0, 0],
+                                                  [0, 1, 0, 0, 0, 0]], dtype=np.float32)
+        self.kalman.measurementNoiseCov = np.eye(2, dtype=np.float32) * measurement_noise
+        
+        self.initialized = False
+        self.last_timestamp = None
+    
+    def reset(self):
+        """
+        Oublie l'état courant (le prochain point réinitialise le filtre)
+        """
+        self.initialized = False
+        self.last_timestamp = None
+    
+    def initialize(self, x, y, timestamp):
+        """
+        Démarre le filtre sur une première mesure
+        """
+        self.kalman.statePost = np.array([[x], [y], [0], [0], [0], [0]], dtype=np.float32)
+        self.kalman.errorCovPost = np.diag([
+            self.measurement_noise, self.measurement_noise,
+            self.initial_velocity_std ** 2, self.initial_velocity_std ** 2,
+            self.initial_acceleration_std ** 2, self.initial_acceleration_std ** 2,
+        ]).astype(np.float32)
+        self.initialized = True
+        self.last_timestamp = timestamp
+    
+    def _set_time_step(self, dt):
+        """
+        Met à jour les matrices de transition et de bruit pour un pas de temps dt
+        """
+        transition = np.eye(6, dtype=np.float32)
+        transition[0, 2] = transition[1, 3] = dt
+        transition[2, 4] = transition[3, 5] = dt
+        transition[0, 4] = transition[1, 5] = 0.5 * dt * dt
+        self.kalman.transitionMatrix = transition
+        
+        # Bruit de processus d'un modèle à jerk blanc, par axe
+        q = self.process_noise
+        axis_noise = q * np.array([[dt**5 / 20, dt**4 / 8, dt**3 / 6],
+                                   [dt**4 / 8, dt**3 / 3, dt**2 / 2],
+                                   [dt**3 / 6, dt**2 / 2, dt]])
+        noise = np.zeros((6, 6), dtype=np.float32)
+        for axis in range(2):
+            indices = [axis, axis + 2, axis + 4]
+            noise[np.ix_(indices, indices)] = axis_noise
+        self.kalman.processNoiseCov = noise
+    
+    def predict(self, timestamp):
+        """
+        Avance l'état jusqu'à timestamp (secondes)
+        Retourne la position prédite (x, y)
+        """
+        dt = timestamp - self.last_timestamp
+        if dt > 0:
+            self._set_time_step(dt)
+            self.kalman.predict()
+            self.last_timestamp = timestamp
+        return self.position()
+    
+    def correct(self, x, y):
+        """
+        Intègre une mesure de position
+        Retourne la position filtrée (x, y)
+        """
+        self.kalman.correct(np.array([[x], [y]], dtype=np.float32))
+        return self.position()
+    
+    def mahalanobis_sq(self, x, y):
+        """
+        Distance de Mahalanobis² entre une mesure et la prédiction courante
+        """
+        covariance = self.kalman.errorCovPost[:2, :2] + self.kalman.measurementNoiseCov
+        innovation = np.array([x, y], dtype=np.float64) - self.kalman.statePost[:2, 0]
+        return float(innovation @ np.linalg.solve(covariance.astype(np.float64), innovation))
+    
+    def is_outlier(self, x, y):
+        """
+        Indique si une mesure est trop loin de la prédiction pour être la balle
+        """
+        return self.mahalanobis_sq(x, y) > self.gate_threshold
+    
+    def position(self):
+        """
+        Position estimée (x, y) en pixels
+        """
+        return float(self.kalman.statePost[0, 0]), float(self.kalman.statePost[1, 0])
+    
+    def velocity(self):
+        """
+        Vitesse estimée (vx, vy) en pixels/s
+        """
+        return float(self.kalman.statePost[2, 0]), float(self.kalman.statePost[3, 0])
+    
+    def speed(self):
+        """
+        Norme de la vitesse estimée en pixels/s
+        """
+        vx, vy = self.velocity()
+        return float(np.hypot(vx, vy))
@@ -2,179 +2,690 @@ import cv2
 import numpy as np
 from collections import deque
 import time
+from ball_kalman import BallKalmanFilter
+from color_lut import ColorLUT
+
+# Profils de couleur de balle: seuils HSV, nettoyage du masque et choix du candidat
+# cleanup: "open_close" (ouverture + fermeture) ou "erode_dilate" (2 érosions + 2 dilatations)
+# selection: "score" (scoring multi-critères) ou "largest" (plus grand contour)
+COLOR_PROFILES = {
+    "jaune": {
+        "hue_min": 20,  # Ajusté selon vos tests
+        "hue_max": 35,  # Légèrement élargi
+        "sat_min": 80,  # Réduit pour détecter la balle à distance
+        "val_min": 100,  # Réduit pour accepter des conditions variées
+        "min_circularity": 0.7,  # Augmenté pour être plus strict sur la forme
+        "min_area": 50,  # Réduit pour détecter la balle plus loin (apparaît plus petite)
+        "min_radius": 5,  # Réduit pour détecter la balle lointaine
+        "max_radius": 150,
+        "cleanup": "open_close",
+        "selection": "score",
+    },
+    "orange": {
+        "hue_min": 5, "hue_max": 25, "sat_min": 100, "val_min": 100,
+        "min_circularity": 0.0, "min_area": 50, "min_radius": 5, "max_radius": 100,
+        "cleanup": "erode_dilate", "selection": "largest",
+    },
+}
+
+# Nombre de positions récentes utilisées pour le calcul de la vitesse
+SPEED_WINDOW = 5
+
+
+def read_only_view(frame):
+    """
+    Vue en lecture seule d'une frame (sans copie des pixels)
+    La détection ne modifie jamais la frame: l'appelant peut ensuite l'annoter
+    sur place; toute écriture accidentelle dans la vue lève une erreur
+    """
+    view = frame.view()
+    view.flags.writeable = False
+    return view
+
+
+def calculate_speed_kmh(positions, timestamps, pixels_per_meter):
+    """
+    Calcule une vitesse en km/h sur les 5 dernières positions d'une trajectoire
+    positions: séquence de (x, y) en pixels
+    timestamps: instants correspondants en secondes
+    """
+    if len(positions) < 2:
+        return 0.0
+    
+    # Prendre les 5 dernières positions pour un calcul plus stable
+    num_points = min(SPEED_WINDOW, len(positions))
+    if num_points < 2:
+        return 0.0
+    
+    # Calculer la distance totale parcourue
+    total_distance_pixels = 0
+    for i in range(-num_points + 1, 0):
+        x1, y1 = positions[i-1]
+        x2, y2 = positions[i]
+        distance = np.sqrt((x2 - x1)**2 + (y2 - y1)**2)
+        total_distance_pixels += distance
+    
+    # Calculer le temps écoulé
+    time_elapsed = timestamps[-1] - timestamps[-num_points]
+    
+    if time_elapsed > 0:
+        # Convertir en vitesse réelle
+        distance_meters = total_distance_pixels / pixels_per_meter
+        speed_ms = distance_meters / time_elapsed  # mètres par seconde
+        speed_kmh = speed_ms * 3.6  # conversion en km/h
+        return speed_kmh
+    
+    return 0.0
+
+
+def calculate_speeds_kmh(positions, timestamps, pixels_per_meter):
+    """
+    Version vectorisée de calculate_speed_kmh sur toute une trajectoire
+    positions: tableau (N, 2) de (x, y) en pixels
+    timestamps: N instants en secondes
+    Retourne les N vitesses en km/h: la i-ème est celle que calculate_speed_kmh
+    donne juste après l'ajout de la i-ème position (mêmes opérations, même ordre)
+    """
+    positions = np.asarray(positions, dtype=np.int64).reshape(-1, 2)
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    count = len(positions)
+    speeds = np.zeros(count)
+    if count < 2:
+        return speeds
+    
+    steps = np.diff(positions, axis=0)
+    segments = np.sqrt(steps[:, 0]**2 + steps[:, 1]**2)
+    
+    # Somme des 4 derniers segments (fenêtre de 5 positions), du plus ancien au plus récent
+    padded = np.concatenate([np.zeros(3), segments])
+    distances = padded[0:count - 1] + padded[1:count] + padded[2:count + 1] + padded[3:count + 2]
+    
+    first = np.maximum(np.arange(1, count) - 4, 0)
+    elapsed = timestamps[1:] - timestamps[first]
+    valid = elapsed > 0
+    speeds[1:][valid] = distances[valid] / pixels_per_meter / elapsed[valid] * 3.6
+    return speeds
+
+
+class AdaptiveStride:
+    def __init__(self, idle_stride=4, active_hold=15):
+        """
+        Pas d'analyse adaptatif pour les longues vidéos
+        Tant que rien ne se passe, une frame sur idle_stride est analysée; dès
+        qu'une frame analysée est active (balle détectée), toutes les frames le
+        sont pendant au moins active_hold frames
+        Les vitesses restent justes: elles sont calculées sur les vrais numéros de frame
+        """
+        self.idle_stride = max(1, int(idle_stride))
+        self.active_hold = active_hold
+        self.last_analyzed = None
+        self.last_active = None
+        self.analyzed = 0
+        self.skipped = 0
+    
+    def should_analyze(self, frame_number):
+        """
+        Indique si la frame doit être analysée
+        """
+        return (self.last_analyzed is None
+                or (self.last_active is not None and frame_number - self.last_active <= self.active_hold)
+                or frame_number - self.last_analyzed >= self.idle_stride)
+    
+    def skip(self):
+        """
+        Compte une frame sautée
+        """
+        self.skipped += 1
+    
+    def update(self, frame_number, active):
+        """
+        Enregistre le résultat de l'analyse d'une frame
+        active: True si quelque chose se passe (balle détectée)
+        """
+        self.analyzed += 1
+        self.last_analyzed = frame_number
+        if active:
+            self.last_active = frame_number
+    
+    @property
+    def skipped_fraction(self):
+        """
+        Proportion des frames sautées
+        """
+        total = self.analyzed + self.skipped
+        return self.skipped / total if total else 0.0
+
+
+class BallDetection:
+    def __init__(self, position, candidates, num_contours, mask, search_window=None):
+        """
+        Résultat d'une passe de détection de balle
+        position: (x, y, radius) du meilleur candidat ou None
+        candidates: candidats retenus, du meilleur au moins bon (score ou aire selon
+                    le profil), chacun un dict avec x, y, radius, area,
+                    circularity, saturation et score
+        num_contours: nombre de contours trouvés dans le masque
+        mask: masque de couleur de la zone analysée
+        search_window: zone analysée (x0, y0, x1, y1) ou None pour toute la frame
+        """
+        self.position = position
+        self.candidates = candidates
+        self.num_contours = num_contours
+        self.mask = mask
+        self.search_window = search_window
+
 
 class BallTracker:
-    def __init__(self, max_positions=30):
+    def __init__(self, max_positions=30, color_profile="jaune"):
         """
         Initialise le tracker de balle
         max_positions: nombre de positions à garder en mémoire pour la trajectoire
+        color_profile: nom du profil de couleur (voir COLOR_PROFILES)
         """
         self.positions = deque(maxlen=max_positions)
         self.timestamps = deque(maxlen=max_positions)
+        self.frame_indices = deque(maxlen=max_positions)  # Numéro de frame de chaque position (ou None)
         self.ball_found = False
         self.speed_kmh = 0.0
         
         # Calibration: distance pixels -> mètres (à ajuster selon votre configuration)
         self.pixels_per_meter = 100  # À calibrer selon votre vidéo
+        self.fps = 30  # Utilisé pour convertir les numéros de frame en temps
         
-        # Paramètres ajustables pour la détection
-        self.hue_min = 20  # Ajusté selon vos tests
-        self.hue_max = 35  # Légèrement élargi
-        self.sat_min = 80  # Réduit pour détecter la balle à distance
-        self.val_min = 100  # Réduit pour accepter des conditions variées
-        self.min_circularity = 0.7  # Augmenté pour être plus strict sur la forme
-        self.min_area = 50  # Réduit pour détecter la balle plus loin (apparaît plus petite)
-        self.min_radius = 5  # Réduit pour détecter la balle lointaine
-        self.max_radius = 150
+        # Paramètres ajustables pour la détection, initialisés par le profil de couleur:
+        # hue_min, hue_max, sat_min, val_min, min_circularity, min_area,
+        # min_radius, max_radius, cleanup et selection
+        self.set_color_profile(color_profile)
+        self.debug = False  # Active les informations de debug (nombre de contours)
         self.num_contours = 0  # Pour debug
+        self.last_detection = None  # Dernier BallDetection calculé par update
+        
+        # Mode fenêtre de recherche (ROI) autour de la position prédite
+        # Le pipeline complet ne tourne que sur un recadrage de la frame,
+        # avec retour au balayage complet après roi_max_misses échecs
+        self.use_roi = False
+        self.roi_margin = 60  # Marge minimale autour de la position prédite (pixels)
+        self.roi_max_misses = 5
+        self.roi_misses = 0
+        self.last_radius = 0
+        self.search_window = None  # Dernière fenêtre analysée (x0, y0, x1, y1) ou None
+        
+        # Modèle de mouvement optionnel (filtre de Kalman à accélération constante)
+        # Lisse la trajectoire, rejette les candidats incohérents avec la prédiction
+        # et prolonge la trajectoire pendant max_gap_frames frames sans détection
+        self.use_kalman = False
+        self.kalman = BallKalmanFilter()
+        self.max_gap_frames = 5
+        self.gap_frames = 0
+        self.predicted_position = None  # Position prédite pour la frame courante
+        
+        # Moteur de segmentation: "hsv" (conversion HSV + inRange) ou "lut"
+        # (table BGR précalculée, reconstruite seulement quand les seuils changent)
+        # Le moteur LUT est plus lent que HSV (lecture de table pixel par pixel):
+        # il ne sert qu'aux comparaisons de color_lut.py
+        self.segmentation = "hsv"
+        self.color_lut = ColorLUT()
+        
+        # Mode pyramide: recherche sur une image réduite (1/2 ou 1/4) puis
+        # affinage en pleine résolution; désactivé (pleine résolution) tant que
+        # la balle suivie a un rayon inférieur à pyramid_min_radius
+        self.pyramid_scale = 1
+        self.pyramid_min_radius = 16
+        
+        # Tampon réutilisé pour les masques circulaires du scoring des candidats
+        self.score_buffer = np.zeros((0, 0), dtype=np.uint8)
         
-    def detect_ball(self, frame):
+        # Pré-filtre de mouvement optionnel (motion_detection.MotionDetector):
+        # la recherche est limitée à la zone en mouvement et à la fenêtre de la
+        # balle suivie (un déplacement lent de quelques pixels peut rester sous le
+        # seuil du filtre); frame immobile sans balle suivie = détection
+        # précédente réutilisée
+        self.motion_gate = None
+        
+    def set_color_profile(self, name):
         """
-        Détecte la balle dans la frame en utilisant la détection de couleur
-        Retourne (x, y, radius) ou None si non trouvée
+        Applique un profil de couleur (seuils, nettoyage et choix du candidat)
         """
-        # Convertir en HSV pour meilleure détection de couleur
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        if name not in COLOR_PROFILES:
+            raise ValueError(f"Profil de couleur inconnu: {name} (disponibles: {', '.join(COLOR_PROFILES)})")
+        for key, value in COLOR_PROFILES[name].items():
+            setattr(self, key, value)
+        self.color_profile = name
+    
+    def append_position(self, x, y, timestamp, frame_index=None):
+        """
+        Ajoute un point à la trajectoire
+        """
+        self.positions.append((x, y))
+        self.timestamps.append(timestamp)
+        self.frame_indices.append(frame_index)
+    
+    def predict_position(self):
+        """
+        Prédit la position de la balle dans la prochaine frame
+        (prédiction du filtre de Kalman si actif, sinon extrapolation à vitesse
+        constante à partir des deux dernières positions)
+        Retourne (x, y) ou None si aucune position connue
+        """
+        if self.use_kalman and self.predicted_position is not None:
+            x, y = self.predicted_position
+            return (int(x), int(y))
         
+        if len(self.positions) == 0:
+            return None
+        
+        x, y = self.positions[-1]
+        if len(self.positions) >= 2:
+            prev_x, prev_y = self.positions[-2]
+            x, y = 2 * x - prev_x, 2 * y - prev_y
+        
+        return (int(x), int(y))
+    
+    def get_search_window(self, frame_shape):
+        """
+        Calcule la fenêtre de recherche autour de la position prédite
+        Retourne (x0, y0, x1, y1) ou None pour un balayage complet
+        """
+        if not self.use_roi or self.roi_misses >= self.roi_max_misses:
+            return None
+        return self.prediction_window(frame_shape)
+    
+    def prediction_window(self, frame_shape):
+        """
+        Fenêtre autour de la position prédite, élargie selon la taille de la balle
+        et son dernier déplacement
+        Retourne (x0, y0, x1, y1) ou None pour un balayage complet
+        """
+        predicted = self.predict_position()
+        if predicted is None:
+            return None
+        
+        # La fenêtre grandit avec la taille de la balle et son déplacement
+        displacement = 0
+        if len(self.positions) >= 2:
+            (x1, y1), (x2, y2) = self.positions[-2], self.positions[-1]
+            displacement = int(np.hypot(x2 - x1, y2 - y1))
+        half_size = self.roi_margin + 2 * self.last_radius + displacement
+        
+        frame_height, frame_width = frame_shape[:2]
+        x, y = predicted
+        x0, y0 = max(0, x - half_size), max(0, y - half_size)
+        x1, y1 = min(frame_width, x + half_size), min(frame_height, y + half_size)
+        
+        # Fenêtre hors de l'image ou couvrant toute l'image: balayage complet
+        if x1 - x0 <= 0 or y1 - y0 <= 0:
+            return None
+        if x1 - x0 >= frame_width and y1 - y0 >= frame_height:
+            return None
+        
+        return (x0, y0, x1, y1)
+    
+    def motion_search_window(self, frame_shape):
+        """
+        Fenêtre de recherche du pré-filtre de mouvement: zone en mouvement, étendue
+        à la fenêtre de la balle suivie (sa traînée de différence d'images peut
+        être trop petite pour passer le filtre quand elle se déplace lentement)
+        Retourne (x0, y0, x1, y1) ou None pour un balayage complet
+        """
+        windows = []
+        if self.motion_gate.moving:
+            windows.append(self.motion_gate.region(frame_shape))
+        if self.ball_found:
+            window = self.prediction_window(frame_shape)
+            if window is None:
+                return None
+            windows.append(window)
+        if not windows:
+            return None
+        
+        windows = np.array(windows)
+        return (int(windows[:, 0].min()), int(windows[:, 1].min()),
+                int(windows[:, 2].max()), int(windows[:, 3].max()))
+    
+    def circle_mean(self, channel, cx, cy, radius):
+        """
+        Calcule la moyenne d'un canal à l'intérieur d'un cercle
+        Travaille uniquement sur le rectangle englobant du cercle, avec un
+        tampon réutilisé: le coût dépend de la taille du candidat et non de la frame
+        """
+        height, width = channel.shape[:2]
+        x0, y0 = max(0, cx - radius), max(0, cy - radius)
+        x1, y1 = min(width, cx + radius + 1), min(height, cy + radius + 1)
+        if x1 <= x0 or y1 <= y0:
+            return 0.0
+        
+        box_h, box_w = y1 - y0, x1 - x0
+        if self.score_buffer.shape[0] < box_h or self.score_buffer.shape[1] < box_w:
+            self.score_buffer = np.zeros((max(box_h, self.score_buffer.shape[0]),
+                                          max(box_w, self.score_buffer.shape[1])), dtype=np.uint8)
+        
+        circle_mask = self.score_buffer[:box_h, :box_w]
+        circle_mask[:] = 0
+        cv2.circle(circle_mask, (cx - x0, cy - y0), radius, 255, -1)
+        
+        return cv2.mean(channel[y0:y1, x0:x1], mask=circle_mask)[0]
+    
+    def segment(self, frame):
+        """
+        Calcule le masque brut de la couleur de la balle
+        Retourne (masque, image HSV ou None si le moteur LUT est utilisé)
+        """
         # Plages de couleur pour une balle jaune vive - ajustables en temps réel
         lower_yellow = np.array([self.hue_min, self.sat_min, self.val_min])
         upper_yellow = np.array([self.hue_max, 255, 255])
         
+        if self.segmentation == "lut":
+            self.color_lut.update(lower_yellow, upper_yellow)
+            return self.color_lut.apply(frame), None
+        
+        # Convertir en HSV pour meilleure détection de couleur
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        return cv2.inRange(hsv, lower_yellow, upper_yellow), hsv
+    
+    def candidate_saturation(self, frame, hsv, cx, cy, radius):
+        """
+        Saturation moyenne d'un candidat circulaire
+        Sans image HSV (moteur LUT), seul le rectangle englobant est converti
+        """
+        if hsv is not None:
+            return self.circle_mean(hsv[:, :, 1], cx, cy, radius)
+        
+        height, width = frame.shape[:2]
+        x0, y0 = max(0, cx - radius), max(0, cy - radius)
+        x1, y1 = min(width, cx + radius + 1), min(height, cy + radius + 1)
+        if x1 <= x0 or y1 <= y0:
+            return 0.0
+        saturation = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2HSV)[:, :, 1]
+        return self.circle_mean(saturation, cx - x0, cy - y0, radius)
+    
+    def detect(self, frame, search_window=None, scale=1):
+        """
+        Détecte la balle dans la frame en utilisant la détection de couleur
+        search_window: (x0, y0, x1, y1) pour limiter la recherche à une zone,
+                       None pour analyser toute la frame
+        scale: facteur de réduction de l'image analysée (1 = pleine résolution)
+        Retourne un BallDetection (balle choisie, candidats, nombre de contours, masque)
+        Les candidats sont triés selon le mode de sélection du profil
+        Les coordonnées retournées sont toujours celles de la frame complète
+        """
+        frame_height = frame.shape[0]
+        offset_x, offset_y = 0, 0
+        if search_window is not None:
+            offset_x, offset_y, x1, y1 = search_window
+            frame = frame[offset_y:y1, offset_x:x1]
+        
+        # Image réduite: les seuils de taille sont ramenés à la même échelle
+        scale_x, scale_y = 1, 1
+        if scale > 1:
+            height, width = frame.shape[:2]
+            small_size = (max(1, width // scale), max(1, height // scale))
+            frame = cv2.resize(frame, small_size, interpolation=cv2.INTER_AREA)
+            scale_x, scale_y = width / small_size[0], height / small_size[1]
+        min_area = self.min_area / (scale * scale)
+        min_radius = self.min_radius / scale
+        max_radius = self.max_radius / scale
+        
         # Créer un masque pour la couleur jaune
-        mask = cv2.inRange(hsv, lower_yellow, upper_yellow)
+        mask, hsv = self.segment(frame)
         
         # Nettoyer le masque avec morphologie plus agressive
         # Cela aide à éliminer les petits reflets
         kernel = np.ones((5, 5), np.uint8)  # Réduit pour garder les petites balles lointaines
-        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=1)
-        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=1)
+        if self.cleanup == "erode_dilate":
+            mask = cv2.erode(mask, kernel, iterations=2)
+            mask = cv2.dilate(mask, kernel, iterations=2)
+        else:
+            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=1)
+            mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=1)
         mask = cv2.GaussianBlur(mask, (5, 5), 0)  # Réduit aussi
         
-        # Trouver les contours
+        # Trouver les contours (une seule passe, réutilisée pour le debug)
         contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
-        frame_height = frame.shape[0]
-        
-        if len(contours) > 0:
-            # Filtrer les contours par circularité et taille avec scoring
-            valid_contours = []
-            for contour in contours:
-                area = cv2.contourArea(contour)
-                
-                # Filtrer les contours trop petits (évite les petits reflets)
-                if area < self.min_area:
-                    continue
-                
-                # Calculer la circularité (4*pi*area/perimeter^2)
-                # Une balle parfaite a une circularité de 1.0
-                perimeter = cv2.arcLength(contour, True)
-                if perimeter == 0:
-                    continue
-                    
-                circularity = 4 * np.pi * area / (perimeter * perimeter)
-                
-                # Filtrer les formes non circulaires (reflets allongés)
-                if circularity > self.min_circularity:
-                    # Calculer le cercle et sa position
-                    ((x, y), radius) = cv2.minEnclosingCircle(contour)
-                    
-                    if radius < self.min_radius or radius > self.max_radius:
-                        continue
-                    
-                    # Calculer la saturation moyenne dans la région
-                    mask_region = np.zeros(hsv.shape[:2], dtype=np.uint8)
-                    cv2.circle(mask_region, (int(x), int(y)), int(radius), 255, -1)
-                    mean_sat = cv2.mean(hsv[:, :, 1], mask=mask_region)[0]
-                    
-                    # Système de scoring multi-critères
-                    score = 0.0
-                    
-                    # Score basé sur la position verticale (plus bas = meilleur)
-                    # Les balles au sol sont dans la partie basse, les reflets murs en haut
-                    y_ratio = y / frame_height
-                    score += y_ratio * 100  # 0-100 points (plus bas = plus de points)
-                    
-                    # Score basé sur la circularité (plus rond = meilleur)
-                    score += circularity * 50  # 0-50 points
-                    
-                    # Score basé sur la saturation (plus saturé = meilleur)
-                    score += (mean_sat / 255) * 50  # 0-50 points
-                    
-                    # Score basé sur la taille (plus gros = plus proche = meilleur)
-                    score += (radius / self.max_radius) * 30  # 0-30 points
-                    
-                    valid_contours.append((contour, radius, circularity, score, mean_sat, y))
+        # Filtrer les contours par circularité et taille avec scoring
+        candidates = []
+        for contour in contours:
+            area = cv2.contourArea(contour)
+            
+            # Filtrer les contours trop petits (évite les petits reflets)
+            if area < min_area:
+                continue
+            
+            # Calculer la circularité (4*pi*area/perimeter^2)
+            # Une balle parfaite a une circularité de 1.0
+            perimeter = cv2.arcLength(contour, True)
+            if perimeter == 0:
+                continue
+            
+            circularity = 4 * np.pi * area / (perimeter * perimeter)
+            
+            # Filtrer les formes non circulaires (reflets allongés)
+            if circularity <= self.min_circularity:
+                continue
+            
+            # Calculer le cercle et sa position
+            ((x, y), radius) = cv2.minEnclosingCircle(contour)
+            
+            if radius < min_radius or radius > max_radius:
+                continue
             
-            if len(valid_contours) > 0:
-                # Trier par score (plus haut = meilleur candidat)
-                valid_contours.sort(key=lambda x: x[3], reverse=True)
-                
-                # Prendre le meilleur candidat
-                best_contour, best_radius, _, _, _, _ = valid_contours[0]
-                
-                # Trouver le cercle minimum englobant
-                ((x, y), radius) = cv2.minEnclosingCircle(best_contour)
-                
-                return (int(x), int(y), int(radius)), mask
-        
-        return None, mask
+            # Calculer la saturation moyenne dans la région
+            mean_sat = self.candidate_saturation(frame, hsv, int(x), int(y), int(radius))
+            
+            # Revenir aux coordonnées de la frame complète
+            x = x * scale_x + offset_x
+            y = y * scale_y + offset_y
+            radius = radius * scale
+            
+            # Système de scoring multi-critères
+            score = 0.0
+            
+            # Score basé sur la position verticale (plus bas = meilleur)
+            # Les balles au sol sont dans la partie basse, les reflets murs en haut
+            y_ratio = y / frame_height
+            score += y_ratio * 100  # 0-100 points (plus bas = plus de points)
+            
+            # Score basé sur la circularité (plus rond = meilleur)
+            score += circularity * 50  # 0-50 points
+            
+            # Score basé sur la saturation (plus saturé = meilleur)
+            score += (mean_sat / 255) * 50  # 0-50 points
+            
+            # Score basé sur la taille (plus gros = plus proche = meilleur)
+            score += (radius / self.max_radius) * 30  # 0-30 points
+            
+            candidates.append({
+                'x': x,
+                'y': y,
+                'radius': radius,
+                'area': area * scale * scale,
+                'circularity': circularity,
+                'saturation': mean_sat,
+                'score': score,
+            })
+        
+        # Trier par score (plus haut = meilleur candidat) ou par taille
+        sort_key = 'area' if self.selection == "largest" else 'score'
+        candidates.sort(key=lambda c: c[sort_key], reverse=True)
+        
+        position = None
+        if len(candidates) > 0:
+            best = candidates[0]
+            position = (int(best['x']), int(best['y']), int(best['radius']))
+        
+        return BallDetection(position, candidates, len(contours), mask, search_window)
+    
+    def detect_pyramid(self, frame, search_window=None):
+        """
+        Détection grossière puis fine: les candidats sont cherchés sur une image
+        réduite de pyramid_scale, puis seul le meilleur est affiné en pleine
+        résolution dans une petite fenêtre autour de lui
+        Retourne un BallDetection (masque de l'image réduite, candidats de l'image
+        réduite sauf le premier, remplacé par sa version affinée)
+        """
+        coarse = self.detect(frame, search_window, scale=self.pyramid_scale)
+        if coarse.position is None:
+            return coarse
+        
+        x, y, radius = coarse.position
+        half_size = int(radius * 1.5) + 2 * self.pyramid_scale
+        frame_height, frame_width = frame.shape[:2]
+        window = (max(0, x - half_size), max(0, y - half_size),
+                  min(frame_width, x + half_size + 1), min(frame_height, y + half_size + 1))
+        
+        fine = self.detect(frame, window)
+        if fine.position is not None:
+            # Le filtre de Kalman lit les candidats: le meilleur doit aussi être affiné
+            coarse.position = fine.position
+            coarse.candidates[0] = fine.candidates[0]
+        return coarse
+    
+    def use_pyramid(self):
+        """
+        Indique si la frame courante peut être analysée en mode pyramide
+        (balle suivie et assez grosse pour rester visible à l'échelle réduite)
+        """
+        return (self.pyramid_scale > 1 and self.ball_found
+                and self.last_radius >= self.pyramid_min_radius)
+    
+    def detect_ball(self, frame, search_window=None):
+        """
+        Détecte la balle dans la frame (voir detect)
+        Retourne ((x, y, radius) ou None, masque de la zone analysée)
+        """
+        detection = self.detect(frame, search_window)
+        return detection.position, detection.mask
     
     def calculate_speed(self):
         """
         Calcule la vitesse de la balle en km/h basée sur les positions récentes
         """
-        if len(self.positions) < 2:
-            return 0.0
+        return calculate_speed_kmh(self.positions, self.timestamps, self.pixels_per_meter)
+    
+    def resolve_timestamp(self, timestamp=None, frame_index=None):
+        """
+        Instant (secondes) associé à une frame
+        Priorité à l'horodatage de capture, puis au numéro de frame (divisé par
+        fps), et à défaut à l'heure de traitement (time.time())
+        """
+        if timestamp is not None:
+            return timestamp
+        if frame_index is not None:
+            return frame_index / self.fps
+        return time.time()
+    
+    def update(self, frame, timestamp=None, frame_index=None):
+        """
+        Met à jour le tracker avec une nouvelle frame
+        frame: frame BGR, lue sans être modifiée (une vue en lecture seule suffit)
+        timestamp: instant de capture de la frame en secondes (temps média)
+        frame_index: numéro de la frame, utilisé si timestamp n'est pas fourni
+        Sans l'un ni l'autre, l'heure de traitement est utilisée
+        """
+        current_time = self.resolve_timestamp(timestamp, frame_index)
         
-        # Prendre les 5 dernières positions pour un calcul plus stable
-        num_points = min(5, len(self.positions))
-        if num_points < 2:
-            return 0.0
+        # Prédiction du modèle de mouvement pour cette frame
+        self.predicted_position = None
+        if self.use_kalman and self.kalman.initialized:
+            self.predicted_position = self.kalman.predict(current_time)
         
-        # Calculer la distance totale parcourue
-        total_distance_pixels = 0
-        for i in range(-num_points + 1, 0):
-            x1, y1 = self.positions[i-1]
-            x2, y2 = self.positions[i]
-            distance = np.sqrt((x2 - x1)**2 + (y2 - y1)**2)
-            total_distance_pixels += distance
+        self.search_window = self.get_search_window(frame.shape)
+        if self.motion_gate is not None:
+            self.motion_gate.detect(frame, frame_id=current_time)
         
-        # Calculer le temps écoulé
-        time_elapsed = self.timestamps[-1] - self.timestamps[-num_points]
+        gate_static = (self.motion_gate is not None and not self.motion_gate.moving
+                       and not self.ball_found)
+        if gate_static and self.last_detection is not None:
+            # Rien ne bouge et aucune balle suivie: la segmentation donnerait le même résultat
+            detection = self.last_detection
+        else:
+            if self.motion_gate is not None and self.search_window is None:
+                self.search_window = self.motion_search_window(frame.shape)
+            if self.use_pyramid():
+                detection = self.detect_pyramid(frame, self.search_window)
+            else:
+                detection = self.detect(frame, self.search_window)
+        self.last_detection = detection
+        result, mask = detection.position, detection.mask
         
-        if time_elapsed > 0:
-            # Convertir en vitesse réelle
-            distance_meters = total_distance_pixels / self.pixels_per_meter
-            speed_ms = distance_meters / time_elapsed  # mètres par seconde
-            speed_kmh = speed_ms * 3.6  # conversion en km/h
-            return speed_kmh
+        # Nombre de contours pour debug (issu de la passe de détection)
+        if self.debug:
+            self.num_contours = detection.num_contours
         
-        return 0.0
+        if self.use_kalman:
+            return self.update_kalman(detection, current_time, frame_index), mask
+        
+        return self.record_detection(result, current_time, frame_index), mask
     
-    def update(self, frame):
+    def record_detection(self, result, current_time, frame_index=None):
         """
-        Met à jour le tracker avec une nouvelle frame
+        Enregistre le résultat d'une détection sans filtre de Kalman
+        result: (x, y, radius) ou None si la balle n'a pas été trouvée
+        Retourne la position enregistrée (x, y, radius) ou None
         """
-        result, mask = self.detect_ball(frame)
-        current_time = time.time()
-        
-        # Compter le nombre de contours pour debug
-        contours, _ = cv2.findContours(mask.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        self.num_contours = len(contours)
-        
         if result is not None:
             x, y, radius = result
-            self.positions.append((x, y))
-            self.timestamps.append(current_time)
+            self.append_position(x, y, current_time, frame_index)
             self.ball_found = True
+            self.last_radius = radius
+            self.roi_misses = 0
             
             # Calculer la vitesse
             self.speed_kmh = self.calculate_speed()
             
-            return (x, y, radius), mask
+            return (x, y, radius)
         else:
             self.ball_found = False
-            return None, mask
+            if self.search_window is not None:
+                self.roi_misses += 1
+            return None
+    
+    def update_kalman(self, detection, current_time, frame_index=None):
+        """
+        Met à jour la trajectoire filtrée à partir des candidats détectés
+        Le meilleur candidat compatible avec la prédiction est retenu; sans candidat
+        valide, la position prédite prolonge la trajectoire pendant max_gap_frames
+        Retourne (x, y, radius) du candidat retenu ou None
+        """
+        measurement = None
+        for candidate in detection.candidates:
+            if not self.kalman.initialized or not self.kalman.is_outlier(candidate['x'], candidate['y']):
+                measurement = candidate
+                break
+        
+        if measurement is not None:
+            x, y, radius = measurement['x'], measurement['y'], int(measurement['radius'])
+            if self.kalman.initialized:
+                filtered_x, filtered_y = self.kalman.correct(x, y)
+            else:
+                self.kalman.initialize(x, y, current_time)
+                filtered_x, filtered_y = x, y
+            
+            self.append_position(int(filtered_x), int(filtered_y), current_time, frame_index)
+            self.ball_found = True
+            self.last_radius = radius
+            self.roi_misses = 0
+            self.gap_frames = 0
+            self.speed_kmh = self.kalman.speed() / self.pixels_per_meter * 3.6
+            
+            return (int(x), int(y), radius)
+        
+        self.ball_found = False
+        if self.search_window is not None:
+            self.roi_misses += 1
+        
+        if self.kalman.initialized and self.gap_frames < self.max_gap_frames:
+            # Occlusion courte: on prolonge la trajectoire avec la prédiction
+            self.gap_frames += 1
+            predicted_x, predicted_y = self.kalman.position()
+            self.append_position(int(predicted_x), int(predicted_y), current_time, frame_index)
+            self.speed_kmh = self.kalman.speed() / self.pixels_per_meter * 3.6
+        else:
+            # Balle perdue: le filtre redémarrera sur la prochaine détection
+            self.kalman.reset()
+            self.gap_frames = 0
+        
+        return None
     
     def draw_trajectory(self, frame):
         """
@@ -232,6 +743,9 @@ def main():
     print("  - 'd/c': Ajuster Value Min (Luminosité)")
     print("  - 'f/v': Ajuster Circularité Min")
     print("  - '+/-': Augmenter/diminuer pixels_per_meter")
+    print("  - 'w': Activer/Désactiver la fenêtre de recherche (ROI)")
+    print("  - 'k': Activer/Désactiver le filtre de Kalman")
+    print("  - 'p': Changer l'échelle du mode pyramide (1, 2, 4)")
     
     tracker = BallTracker(max_positions=50)
     show_help = False
@@ -262,9 +776,15 @@ def main():
                    cv2.FONT_HERSHEY_SIMPLEX, 1, status_color, 2)
         
         # Afficher le nombre de contours détectés (debug)
-        contour_text = f"Contours: {tracker.num_contours}"
-        cv2.putText(frame, contour_text, (10, 60),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
+        if tracker.debug:
+            contour_text = f"Contours: {tracker.num_contours}"
+            cv2.putText(frame, contour_text, (10, 60),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
+        
+        # Afficher la fenêtre de recherche (mode ROI)
+        if tracker.search_window is not None:
+            x0, y0, x1, y1 = tracker.search_window
+            cv2.rectangle(frame, (x0, y0), (x1, y1), (255, 0, 255), 1)
         
         # Afficher les paramètres de calibration
         calib_text = f"Calib: {tracker.pixels_per_meter} px/m"
@@ -295,9 +815,22 @@ def main():
             break
         elif key == ord('r'):
             tracker = BallTracker(max_positions=50)
+            tracker.debug = show_help
             print("🔄 Tracker réinitialisé")
+        elif key == ord('w'):
+            tracker.use_roi = not tracker.use_roi
+            tracker.roi_misses = 0
+            print(f"🔍 Fenêtre de recherche: {'Activée' if tracker.use_roi else 'Désactivée'}")
+        elif key == ord('k'):
+            tracker.use_kalman = not tracker.use_kalman
+            tracker.kalman.reset()
+            print(f"📈 Filtre de Kalman: {'Activé' if tracker.use_kalman else 'Désactivé'}")
+        elif key == ord('p'):
+            tracker.pyramid_scale = {1: 2, 2: 4, 4: 1}[tracker.pyramid_scale]
+            print(f"🔺 Pyramide: échelle 1/{tracker.pyramid_scale}")
         elif key == ord('h'):
             show_help = not show_help
+            tracker.debug = show_help
             print(f"� Aide: {'Affichée' if show_help else 'Masquée'}")
         # Ajustements de la teinte (Hue)
         elif key == ord('a'):
@@ -1,122 +1,87 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 import cv2
 import numpy as np
-from collections import deque
-import time
-import os
+from ball_tracking import SPEED_WINDOW, AdaptiveStride, BallTracker, calculate_speeds_kmh, read_only_view
+from detection_cache import DEFAULT_CACHE_DIR, DetectionCache, detector_params
+from motion_detection import MotionDetector
+from speed_stats import SpeedStatistics
+from tracking_output import TrackingWriter, read_records, tracking_record
+from video_pipeline import run_pipeline
 
-class BallTrackerVideo:
-    def __init__(self, max_positions=50):
+class BallTrackerVideo(BallTracker):
+    def __init__(self, max_positions=50, color_profile="orange", history_size=1000, series_path=None):
         """
         Tracker de balle optimisé pour analyse vidéo
+        Même moteur de détection que BallTracker, avec le temps mesuré en
+        numéros de frame et des statistiques sur toute la vidéo
+        history_size: nombre de vitesses récentes gardées dans speed_history
+        series_path: fichier CSV où écrire toutes les vitesses, ou None
         """
-        self.positions = deque(maxlen=max_positions)
-        self.frame_numbers = deque(maxlen=max_positions)
-        self.ball_found = False
-        self.speed_kmh = 0.0
+        super().__init__(max_positions=max_positions, color_profile=color_profile)
+        self.frame_numbers = self.frame_indices
         self.max_speed = 0.0
         self.avg_speed = 0.0
-        self.speed_history = []
         
-        # Calibration (à ajuster selon la vidéo)
-        self.pixels_per_meter = 100
-        self.fps = 30
+        # Statistiques en flux continu (mémoire bornée quelle que soit la durée)
+        self.stats = SpeedStatistics(history_size=history_size, series_path=series_path)
+        self.speed_history = self.stats.history
         
-    def detect_ball(self, frame):
+        # Trajectoire brute complète (frame, x, y) en pixels: permet de recalculer
+        # toutes les vitesses pour une autre calibration sans refaire la détection
+        self.trajectory = []
+    
+    def update(self, frame, frame_number):
         """
-        Détecte la balle dans la frame
+        Met à jour le tracker
         """
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-        
-        # Plages de couleur pour balle orange/rouge
-        lower_orange = np.array([5, 100, 100])
-        upper_orange = np.array([25, 255, 255])
-        
-        # Masque pour la couleur
-        mask = cv2.inRange(hsv, lower_orange, upper_orange)
-        
-        # Nettoyer le masque
-        kernel = np.ones((5, 5), np.uint8)
-        mask = cv2.erode(mask, kernel, iterations=2)
-        mask = cv2.dilate(mask, kernel, iterations=2)
-        mask = cv2.GaussianBlur(mask, (5, 5), 0)
-        
-        # Trouver les contours
-        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        if len(contours) > 0:
-            largest_contour = max(contours, key=cv2.contourArea)
-            
-            if cv2.contourArea(largest_contour) > 50:
-                ((x, y), radius) = cv2.minEnclosingCircle(largest_contour)
-                
-                if radius > 5 and radius < 100:
-                    return (int(x), int(y), int(radius)), mask
-        
-        return None, mask
+        position, mask = super().update(frame, frame_index=frame_number)
+        self.record_result(position, frame_number)
+        return position, mask
     
-    def calculate_speed(self, frame_number):
+    def warm_up(self, frame, frame_number):
         """
-        Calcule la vitesse basée sur les positions et numéros de frames
+        Met à jour l'état du tracker (trajectoire, fenêtre de recherche) sans toucher
+        aux statistiques ni à la trajectoire brute: mise en route d'un morceau de vidéo
         """
-        if len(self.positions) < 2:
-            return 0.0
-        
-        num_points = min(5, len(self.positions))
-        if num_points < 2:
-            return 0.0
-        
-        # Distance parcourue
-        total_distance_pixels = 0
-        for i in range(-num_points + 1, 0):
-            x1, y1 = self.positions[i-1]
-            x2, y2 = self.positions[i]
-            distance = np.sqrt((x2 - x1)**2 + (y2 - y1)**2)
-            total_distance_pixels += distance
-        
-        # Temps écoulé basé sur les frames
-        frames_elapsed = self.frame_numbers[-1] - self.frame_numbers[-num_points]
-        time_elapsed = frames_elapsed / self.fps
-        
-        if time_elapsed > 0:
-            distance_meters = total_distance_pixels / self.pixels_per_meter
-            speed_ms = distance_meters / time_elapsed
-            speed_kmh = speed_ms * 3.6
-            return speed_kmh
-        
-        return 0.0
+        return super().update(frame, frame_index=frame_number)
     
-    def update(self, frame, frame_number):
+    def replay(self, frame_number, position):
         """
-        Met à jour le tracker
+        Rejoue une position déjà détectée (ex: cache de détections)
+        Même état et mêmes statistiques que update, sans analyser d'image
         """
-        result, mask = self.detect_ball(frame)
-        
-        if result is not None:
-            x, y, radius = result
-            self.positions.append((x, y))
-            self.frame_numbers.append(frame_number)
-            self.ball_found = True
-            
-            # Calculer la vitesse
-            self.speed_kmh = self.calculate_speed(frame_number)
-            
-            if self.speed_kmh > 0:
-                self.speed_history.append(self.speed_kmh)
-                self.max_speed = max(self.max_speed, self.speed_kmh)
-                self.avg_speed = np.mean(self.speed_history)
-            
-            return (x, y, radius), mask
-        else:
-            self.ball_found = False
-            return None, mask
+        current_time = self.resolve_timestamp(frame_index=frame_number)
+        position = self.record_detection(position, current_time, frame_number)
+        self.record_result(position, frame_number)
+        return position
+    
+    def record_result(self, position, frame_number):
+        """
+        Ajoute la position à la trajectoire brute et la vitesse courante aux statistiques
+        """
+        if position is None:
+            return
+        self.trajectory.append((frame_number, position[0], position[1]))
+        if self.speed_kmh > 0:
+            self.stats.add(self.speed_kmh, frame_number)
+            self.max_speed = self.stats.max
+            self.avg_speed = self.stats.mean
     
-    def draw_trajectory(self, frame):
+    def recalibrate(self, pixels_per_meter=None):
         """
-        Dessine la trajectoire
+        Recalcule les vitesses de toute la vidéo pour une calibration, sans re-détection
+        (calcul vectorisé sur la trajectoire brute, hors filtre de Kalman)
+        Retourne les statistiques (voir speed_summary)
         """
-        for i in range(1, len(self.positions)):
-            thickness = int(np.sqrt(len(self.positions) / float(i + 1)) * 2)
-            cv2.line(frame, self.positions[i-1], self.positions[i], (0, 255, 255), thickness)
+        if pixels_per_meter is None:
+            pixels_per_meter = self.pixels_per_meter
+        trajectory = np.array(self.trajectory, dtype=np.int64).reshape(-1, 3)
+        return speed_summary(trajectory[:, 1:], trajectory[:, 0] / self.fps, pixels_per_meter)
     
     def draw_info(self, frame, position):
         """
@@ -142,9 +107,353 @@ class BallTrackerVideo:
                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
 
 
-def analyze_video(video_path, output_path=None):
+def speed_summary(positions, timestamps, pixels_per_meter):
+    """
+    Statistiques de vitesse d'une trajectoire complète pour une calibration donnée
+    positions: tableau (N, 2) de (x, y) en pixels; timestamps: N instants en secondes
+    Les vitesses nulles sont ignorées, comme pendant l'analyse; médiane et
+    90e percentile sont exacts (pas d'histogramme)
+    """
+    speeds = calculate_speeds_kmh(positions, timestamps, pixels_per_meter)
+    speeds = speeds[speeds > 0]
+    if len(speeds) == 0:
+        return {"positions_detected": 0, "max_speed_kmh": 0.0, "avg_speed_kmh": 0.0,
+                "median_speed_kmh": 0.0, "p90_speed_kmh": 0.0, "pixels_per_meter": pixels_per_meter}
+    return {
+        "positions_detected": int(len(speeds)),
+        "max_speed_kmh": float(speeds.max()),
+        "avg_speed_kmh": float(speeds.mean()),
+        "median_speed_kmh": float(np.percentile(speeds, 50)),
+        "p90_speed_kmh": float(np.percentile(speeds, 90)),
+        "pixels_per_meter": pixels_per_meter,
+    }
+
+
+def recalibrate_tracks(tracks_path, pixels_per_meter):
+    """
+    Statistiques de vitesse pour une autre calibration, depuis un fichier de
+    résultats frame par frame (--tracks), sans relire la vidéo
+    """
+    records = [r for r in read_records(tracks_path) if r["x"] is not None]
+    positions = np.array([(r["x"], r["y"]) for r in records], dtype=np.int64).reshape(-1, 2)
+    timestamps = np.array([r["timestamp"] for r in records], dtype=np.float64)
+    return speed_summary(positions, timestamps, pixels_per_meter)
+
+
+def draw_progress(frame, frame_number, total_frames):
+    """
+    Dessine la barre de progression en bas de la frame
+    """
+    height, width = frame.shape[:2]
+    progress = int((frame_number / max(total_frames, 1)) * 100)
+    cv2.rectangle(frame, (10, height - 30), (width - 10, height - 10), (50, 50, 50), -1)
+    cv2.rectangle(frame, (10, height - 30), (10 + int((width - 20) * progress / 100), height - 10), (0, 255, 0), -1)
+    cv2.putText(frame, f"{progress}%", (width // 2 - 30, height - 15),
+               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+
+
+def build_report(tracker, video_path, frames_analyzed, elapsed):
+    """
+    Construit le rapport d'analyse (dict sérialisable en JSON)
+    """
+    return {
+        "video": video_path,
+        "fps": tracker.fps,
+        "frames_analyzed": frames_analyzed,
+        "positions_detected": tracker.stats.count,
+        "max_speed_kmh": tracker.stats.max,
+        "avg_speed_kmh": tracker.stats.mean,
+        "median_speed_kmh": tracker.stats.percentile(50),
+        "p90_speed_kmh": tracker.stats.percentile(90),
+        "pixels_per_meter": tracker.pixels_per_meter,
+        "color_profile": tracker.color_profile,
+        "processing_time_s": elapsed,
+        "processing_fps": frames_analyzed / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def print_report(report):
+    """
+    Affiche le rapport d'analyse
+    """
+    print("\n" + "="*50)
+    print("📊 RAPPORT D'ANALYSE")
+    print("="*50)
+    print(f"Vitesse maximale: {report['max_speed_kmh']:.1f} km/h")
+    print(f"Vitesse moyenne: {report['avg_speed_kmh']:.1f} km/h")
+    print(f"Vitesse médiane: {report['median_speed_kmh']:.1f} km/h "
+          f"(90e percentile: {report['p90_speed_kmh']:.1f} km/h)")
+    print(f"Positions détectées: {report['positions_detected']}")
+    print(f"Calibration utilisée: {report['pixels_per_meter']} pixels/mètre")
+    print("="*50)
+
+
+def analyze_video_headless(video_path, output_path=None, series_path=None,
+                           pixels_per_meter=100, color_profile="orange", verbose=True,
+                           pipelined=False, idle_stride=1, motion_gate=False, tracks_path=None,
+                           cache=None):
+    """
+    Analyse une vidéo sans affichage ni interaction, aussi vite que le décodage le permet
+    Le dessin n'est fait que si une vidéo de sortie est demandée
+    pipelined: décodage, analyse et encodage dans des threads séparés (voir video_pipeline)
+    idle_stride: sans balle, n'analyser qu'une frame sur idle_stride (voir AdaptiveStride);
+                 les frames sautées ne sont pas décodées s'il n'y a pas de vidéo de sortie
+    motion_gate: segmentation limitée aux frames et zones en mouvement (voir MotionDetector)
+    tracks_path: fichier .jsonl ou .parquet où écrire un enregistrement par frame analysée
+    cache: DetectionCache; sans vidéo de sortie, une analyse déjà faite avec les mêmes
+           paramètres de détection est relue depuis le cache (vitesses recalculées);
+           ignoré si le tracker utilise le filtre de Kalman
+    Retourne le rapport (dict, voir build_report) ou None si la vidéo est illisible
+    """
+    if not os.path.exists(video_path):
+        print(f"❌ Fichier vidéo non trouvé: {video_path}")
+        return None
+    
+    cap = cv2.VideoCapture(video_path)
+    
+    if not cap.isOpened():
+        print(f"❌ Impossible d'ouvrir la vidéo: {video_path}")
+        return None
+    
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    
+    if verbose:
+        print(f"📹 Vidéo: {video_path}")
+        print(f"   FPS: {fps}, Frames: {total_frames}, Résolution: {width}x{height}")
+    
+    tracker = BallTrackerVideo(max_positions=100, color_profile=color_profile, series_path=series_path)
+    tracker.fps = fps
+    tracker.pixels_per_meter = pixels_per_meter
+    if motion_gate:
+        tracker.motion_gate = MotionDetector(min_area=tracker.min_area)
+    
+    out = None
+    if output_path:
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+    
+    stride = AdaptiveStride(idle_stride, active_hold=int(fps / 2)) if idle_stride > 1 else None
+    tracks = TrackingWriter(tracks_path) if tracks_path else None
+    
+    # Détections frame par frame mémorisées pour le cache: (frame, position, contours)
+    cache_key = None
+    cached = None
+    detections = []
+    if cache is not None and tracker.use_kalman:
+        # replay rejoue les détections brutes, pas la trajectoire filtrée
+        if verbose:
+            print("ℹ️  Cache des détections ignoré avec le filtre de Kalman")
+        cache = None
+    if cache is not None:
+        cache_key = cache.key(video_path, detector_params(tracker, idle_stride=idle_stride))
+        if out is None:
+            cached = cache.get(cache_key)
+    
+    def process_frame(frame_number, frame):
+        position = None
+        if stride is None or stride.should_analyze(frame_number):
+            # Détection sur une vue en lecture seule, puis annotation sur place
+            position, mask = tracker.update(read_only_view(frame), frame_number)
+            if tracks is not None:
+                tracks.write(tracking_record(tracker, frame_number, frame_number / fps, position))
+            if cache is not None:
+                detections.append((frame_number, position, tracker.last_detection.num_contours))
+            if stride is not None:
+                moving = tracker.motion_gate is not None and tracker.motion_gate.moving
+                stride.update(frame_number, position is not None or moving)
+        else:
+            stride.skip()
+        if out is None:
+            return None
+        tracker.draw_trajectory(frame)
+        tracker.draw_info(frame, position)
+        draw_progress(frame, frame_number, total_frames)
+        return frame
+    
+    start = time.perf_counter()
+    if cached is not None:
+        # Relecture du cache: aucune frame décodée ni analysée
+        if verbose:
+            print("💾 Détections relues depuis le cache")
+        for frame_number, (x, y, radius), num_contours in zip(cached["frames"], cached["positions"],
+                                                               cached["num_contours"]):
+            frame_number = int(frame_number)
+            result = (int(x), int(y), int(radius)) if radius >= 0 else None
+            position = tracker.replay(frame_number, result)
+            if tracks is not None:
+                tracks.write(tracking_record(tracker, frame_number, frame_number / fps, position,
+                                             num_contours=int(num_contours)))
+        frame_number = cached["total_frames"]
+    elif pipelined:
+        frame_number = run_pipeline(cap, process_frame, out)
+    else:
+        frame_number = 0
+        while True:
+            if out is None and stride is not None and not stride.should_analyze(frame_number + 1):
+                # Frame sautée: grab() avance sans décoder l'image
+                ret, frame = cap.grab(), None
+            else:
+                ret, frame = cap.read()
+            if not ret:
+                break
+            frame_number += 1
+            annotated = process_frame(frame_number, frame)
+            if annotated is not None:
+                out.write(annotated)
+    elapsed = time.perf_counter() - start
+    
+    cap.release()
+    tracker.stats.close()
+    if tracks is not None:
+        tracks.close()
+    if out is not None:
+        out.release()
+    if cache is not None and cached is None:
+        frames, positions, contours = zip(*detections) if detections else ((), (), ())
+        cache.put(cache_key, frames, positions, contours, frame_number, fps)
+    
+    report = build_report(tracker, video_path, frame_number, elapsed)
+    report["output_path"] = output_path
+    report["series_path"] = series_path
+    report["tracks_path"] = tracks_path
+    report["frames_skipped"] = stride.skipped if stride is not None else 0
+    report["from_cache"] = cached is not None
+    if cached is not None:
+        report["frames_skipped"] = frame_number - len(cached["frames"])
+    elif tracker.motion_gate is not None:
+        report["motion_static_frames"] = tracker.motion_gate.skipped_frame_fraction
+        report["motion_skipped_pixels"] = tracker.motion_gate.skipped_pixel_fraction
+    if verbose:
+        print_report(report)
+        if stride is not None and cached is None:
+            print(f"⏩ Frames sautées (pas adaptatif {idle_stride}): {stride.skipped_fraction:.0%}")
+        if "motion_static_frames" in report:
+            print(f"📉 Sans mouvement: {report['motion_static_frames']:.0%} des frames, "
+                  f"{report['motion_skipped_pixels']:.0%} des pixels non segmentés")
+        print(f"⏱️  {frame_number} frames en {elapsed:.1f}s ({report['processing_fps']:.1f} frames/s)")
+    return report
+
+
+def _analyze_chunk(task):
+    """
+    Analyse un morceau de vidéo dans un processus séparé
+    task: (video_path, start, end, overlap_frames, fps, pixels_per_meter, color_profile)
+    Analyse les frames start+1 à end (numérotées depuis 1, end=None: jusqu'à la fin),
+    précédées d'au moins overlap_frames frames de mise en route non comptabilisées
+    Retourne (frames analysées, [(frame, vitesse)], SpeedStatistics du morceau)
+    """
+    video_path, start, end, overlap_frames, fps, pixels_per_meter, color_profile = task
+    
+    # Mise en route: à la frame start, le tracker doit contenir les SPEED_WINDOW - 1
+    # dernières positions de l'analyse séquentielle, même anciennes; si la balle n'est
+    # pas assez vue pendant le recouvrement, on recommence plus tôt (recouvrement doublé)
+    cap = cv2.VideoCapture(video_path)
+    overlap = overlap_frames
+    while True:
+        tracker = BallTrackerVideo(max_positions=100, color_profile=color_profile)
+        tracker.fps = fps
+        tracker.pixels_per_meter = pixels_per_meter
+        
+        first = max(start - overlap, 0)
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+        frame_number = first
+        while frame_number < start:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frame_number += 1
+            tracker.warm_up(frame, frame_number)
+        
+        if first == 0 or len(tracker.positions) >= SPEED_WINDOW - 1:
+            break
+        overlap = max(2 * overlap, SPEED_WINDOW)
+    
+    records = []
+    while end is None or frame_number < end:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frame_number += 1
+        
+        position, mask = tracker.update(frame, frame_number)
+        if position is not None and tracker.speed_kmh > 0:
+            records.append((frame_number, tracker.speed_kmh))
+    cap.release()
+    
+    return max(frame_number - start, 0), records, tracker.stats
+
+
+def analyze_video_parallel(video_path, workers=None, overlap_frames=30, series_path=None,
+                           pixels_per_meter=100, color_profile="orange", verbose=True):
+    """
+    Analyse une longue vidéo en la découpant en morceaux traités en parallèle
+    Chaque processus se positionne au début de son morceau (CAP_PROP_POS_FRAMES)
+    et analyse overlap_frames frames de mise en route avant de compter les vitesses,
+    prolongées vers le début de la vidéo tant que le tracker n'a pas retrouvé les
+    dernières positions de l'analyse séquentielle (fenêtre de SPEED_WINDOW positions,
+    ex: balle absente pendant tout le recouvrement)
+    Les vitesses de chaque morceau sont recollées dans l'ordre en un seul rapport
+    workers: nombre de processus (None = nombre de cœurs)
+    Pas de vidéo annotée dans ce mode (voir analyze_video_headless)
+    Retourne le rapport (dict, voir build_report) ou None si la vidéo est illisible
+    """
+    if not os.path.exists(video_path):
+        print(f"❌ Fichier vidéo non trouvé: {video_path}")
+        return None
+    
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print(f"❌ Impossible d'ouvrir la vidéo: {video_path}")
+        return None
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    
+    workers = workers or os.cpu_count() or 1
+    chunk_size = max(total_frames // workers, 1)
+    bounds = list(range(0, max(total_frames, 1), chunk_size))[:workers]
+    tasks = []
+    for i, start in enumerate(bounds):
+        # Le dernier morceau va jusqu'à la fin réelle (le nombre de frames annoncé peut être faux)
+        end = bounds[i + 1] if i + 1 < len(bounds) else None
+        tasks.append((video_path, start, end, overlap_frames, fps, pixels_per_meter, color_profile))
+    
+    if verbose:
+        print(f"📹 Vidéo: {video_path}")
+        print(f"   FPS: {fps}, Frames: {total_frames}, {len(tasks)} morceaux en parallèle")
+    
+    tracker = BallTrackerVideo(max_positions=100, color_profile=color_profile, series_path=series_path)
+    tracker.fps = fps
+    tracker.pixels_per_meter = pixels_per_meter
+    
+    start_time = time.perf_counter()
+    frames_analyzed = 0
+    with ProcessPoolExecutor(max_workers=len(tasks)) as executor:
+        for frames, records, stats in executor.map(_analyze_chunk, tasks):
+            frames_analyzed += frames
+            tracker.stats.merge(stats, records)
+    elapsed = time.perf_counter() - start_time
+    tracker.stats.close()
+    tracker.max_speed = tracker.stats.max
+    tracker.avg_speed = tracker.stats.mean
+    
+    report = build_report(tracker, video_path, frames_analyzed, elapsed)
+    report["workers"] = len(tasks)
+    report["series_path"] = series_path
+    if verbose:
+        print_report(report)
+        print(f"⏱️  {frames_analyzed} frames en {elapsed:.1f}s ({report['processing_fps']:.1f} frames/s)")
+    return report
+
+
+def analyze_video(video_path, output_path=None, series_path=None, tracks_path=None):
     """
     Analyse une vidéo et génère un rapport
+    series_path: fichier CSV où écrire toutes les vitesses mesurées (optionnel)
+    tracks_path: fichier .jsonl ou .parquet des résultats frame par frame (optionnel)
     """
     if not os.path.exists(video_path):
         print(f"❌ Fichier vidéo non trouvé: {video_path}")
@@ -157,7 +466,7 @@ def analyze_video(video_path, output_path=None):
         return
     
     # Propriétés de la vidéo
-    fps = cap.get(cv2.CAP_PROP_FPS)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
@@ -165,8 +474,10 @@ def analyze_video(video_path, output_path=None):
     print(f"📹 Vidéo: {video_path}")
     print(f"   FPS: {fps}, Frames: {total_frames}, Résolution: {width}x{height}")
     
-    tracker = BallTrackerVideo(max_positions=100)
+    tracker = BallTrackerVideo(max_positions=100, series_path=series_path)
     tracker.fps = fps
+    initial_pixels_per_meter = tracker.pixels_per_meter
+    tracks = TrackingWriter(tracks_path) if tracks_path else None
     
     # Préparer l'enregistrement vidéo si demandé
     out = None
@@ -177,6 +488,7 @@ def analyze_video(video_path, output_path=None):
     
     frame_number = 0
     paused = False
+    step = False
     
     print("\n📝 Touches:")
     print("  - ESPACE: Pause/Lecture")
@@ -185,44 +497,43 @@ def analyze_video(video_path, output_path=None):
     print("  - Flèche droite: Frame suivante (en pause)")
     print("\n▶️  Analyse en cours...\n")
     
+    start = time.perf_counter()
     while True:
-        if not paused:
+        # Chaque frame est lue, analysée et annotée une seule fois, sans copie:
+        # la détection reçoit une vue en lecture seule, le dessin se fait sur place
+        # En pause, la dernière frame annotée reste affichée
+        if not paused or step:
             ret, frame = cap.read()
             if not ret:
                 print("✅ Fin de la vidéo")
                 break
             
             frame_number += 1
-        else:
-            # En pause, on utilise la dernière frame
-            ret = True
-        
-        # Analyse
-        position, mask = tracker.update(frame.copy(), frame_number)
-        
-        # Dessiner
-        display_frame = frame.copy()
-        tracker.draw_trajectory(display_frame)
-        tracker.draw_info(display_frame, position)
-        
-        # Barre de progression
-        progress = int((frame_number / total_frames) * 100)
-        cv2.rectangle(display_frame, (10, height - 30), (width - 10, height - 10), (50, 50, 50), -1)
-        cv2.rectangle(display_frame, (10, height - 30), (10 + int((width - 20) * progress / 100), height - 10), (0, 255, 0), -1)
-        cv2.putText(display_frame, f"{progress}%", (width // 2 - 30, height - 15),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            step = False
+            
+            # Analyse
+            position, mask = tracker.update(read_only_view(frame), frame_number)
+            if tracks is not None:
+                tracks.write(tracking_record(tracker, frame_number, frame_number / fps, position))
+            
+            # Dessiner
+            tracker.draw_trajectory(frame)
+            tracker.draw_info(frame, position)
+            
+            # Barre de progression
+            draw_progress(frame, frame_number, total_frames)
+            
+            # Enregistrer si demandé
+            if out is not None:
+                out.write(frame)
         
         # Indicateur pause
         if paused:
-            cv2.putText(display_frame, "PAUSE", (width - 120, 30),
+            cv2.putText(frame, "PAUSE", (width - 120, 30),
                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
         
         # Afficher
-        cv2.imshow("Analyse vidéo - Hockey Trainer", display_frame)
-        
-        # Enregistrer si demandé
-        if out is not None and not paused:
-            out.write(display_frame)
+        cv2.imshow("Analyse vidéo - Hockey Trainer", frame)
         
         # Gestion des touches
         key = cv2.waitKey(1 if not paused else 0) & 0xFF
@@ -234,30 +545,30 @@ def analyze_video(video_path, output_path=None):
             paused = not paused
             print("⏸️  Pause" if paused else "▶️  Lecture")
         elif key == 83:  # Flèche droite
-            if paused:
-                paused = False
-                ret, frame = cap.read()
-                if ret:
-                    frame_number += 1
-                paused = True
-        elif key == ord('+') or key == ord('='):
-            tracker.pixels_per_meter += 10
-            print(f"📏 Calibration: {tracker.pixels_per_meter} px/m")
-        elif key == ord('-'):
-            tracker.pixels_per_meter = max(10, tracker.pixels_per_meter - 10)
-            print(f"📏 Calibration: {tracker.pixels_per_meter} px/m")
-    
-    # Rapport final
-    print("\n" + "="*50)
-    print("📊 RAPPORT D'ANALYSE")
-    print("="*50)
-    print(f"Vitesse maximale: {tracker.max_speed:.1f} km/h")
-    print(f"Vitesse moyenne: {tracker.avg_speed:.1f} km/h")
-    print(f"Positions détectées: {len(tracker.speed_history)}")
-    print(f"Calibration utilisée: {tracker.pixels_per_meter} pixels/mètre")
-    print("="*50)
+            step = paused
+        elif key == ord('+') or key == ord('=') or key == ord('-'):
+            if key == ord('-'):
+                tracker.pixels_per_meter = max(10, tracker.pixels_per_meter - 10)
+            else:
+                tracker.pixels_per_meter += 10
+            # Vitesses déjà mesurées recalculées pour la nouvelle calibration (sans re-détection)
+            summary = tracker.recalibrate()
+            print(f"📏 Calibration: {tracker.pixels_per_meter} px/m | depuis le début: "
+                  f"max {summary['max_speed_kmh']:.1f} km/h, moy {summary['avg_speed_kmh']:.1f} km/h")
+    
+    # Rapport final (vitesses recalculées si la calibration a changé en cours de route)
+    report = build_report(tracker, video_path, frame_number, time.perf_counter() - start)
+    if tracker.pixels_per_meter != initial_pixels_per_meter:
+        report.update(tracker.recalibrate())
+    print_report(report)
     
     cap.release()
+    tracker.stats.close()
+    if series_path:
+        print(f"✅ Série des vitesses sauvegardée: {series_path}")
+    if tracks is not None:
+        tracks.close()
+        print(f"✅ Résultats frame par frame sauvegardés: {tracks_path}")
     if out is not None:
         out.release()
         print(f"✅ Vidéo sauvegardée: {output_path}")
@@ -296,5 +607,66 @@ def main():
         print("❌ Choix invalide")
 
 
+def run_cli(argv):
+    """
+    Analyse non interactive en ligne de commande
+    Exemple: python ball_tracking_video.py match.mp4 --json rapport.json
+    """
+    parser = argparse.ArgumentParser(description="Analyse de balle sans affichage (mode batch)")
+    parser.add_argument("video", help="Chemin de la vidéo à analyser")
+    parser.add_argument("-o", "--output", help="Vidéo annotée à enregistrer (désactive le dessin si absent)")
+    parser.add_argument("--series", help="Fichier CSV pour la série complète des vitesses")
+    parser.add_argument("--json", help="Fichier où écrire le rapport JSON")
+    parser.add_argument("--tracks", help="Résultats frame par frame (.jsonl, ou .parquet avec pyarrow)")
+    parser.add_argument("--ppm", type=float, default=100, help="Calibration en pixels par mètre")
+    parser.add_argument("--profile", default="orange", help="Profil de couleur de la balle")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Décodage, analyse et encodage en parallèle (threads)")
+    parser.add_argument("--stride", type=int, default=1,
+                        help="Sans balle, n'analyser qu'une frame sur N (pas adaptatif)")
+    parser.add_argument("--motion", action="store_true",
+                        help="Segmenter uniquement les frames et zones en mouvement")
+    parser.add_argument("--cache", nargs="?", const=DEFAULT_CACHE_DIR,
+                        help="Cache des détections (dossier, défaut: ~/.hockey_trainer/cache)")
+    parser.add_argument("--cache-size", type=float, default=500,
+                        help="Taille maximale du cache en Mo")
+    parser.add_argument("--workers", type=int,
+                        help="Découper la vidéo en morceaux analysés par N processus (sans -o)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="N'afficher que le rapport JSON")
+    args = parser.parse_args(argv)
+    
+    if args.workers:
+        # Les morceaux sont analysés image par image, sans sortie ni pré-filtre
+        ignored = [name for name, used in (("-o", args.output), ("--tracks", args.tracks),
+                                           ("--pipeline", args.pipeline), ("--stride", args.stride > 1),
+                                           ("--motion", args.motion), ("--cache", args.cache)) if used]
+        if ignored:
+            parser.error(f"--workers n'est pas compatible avec {', '.join(ignored)}")
+    cache = None
+    if args.cache:
+        cache = DetectionCache(args.cache, max_bytes=int(args.cache_size * 1024 * 1024))
+    if args.workers:
+        report = analyze_video_parallel(args.video, args.workers, series_path=args.series,
+                                        pixels_per_meter=args.ppm, color_profile=args.profile,
+                                        verbose=not args.quiet)
+    else:
+        report = analyze_video_headless(args.video, args.output, args.series,
+                                        pixels_per_meter=args.ppm, color_profile=args.profile,
+                                        verbose=not args.quiet, pipelined=args.pipeline,
+                                        idle_stride=args.stride, motion_gate=args.motion,
+                                        tracks_path=args.tracks, cache=cache)
+    if report is None:
+        return 1
+    
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.quiet:
+        print(json.dumps(report, ensure_ascii=False))
+    return 0
+
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(run_cli(sys.argv[1:]))
     main()
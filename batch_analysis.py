@@ -0,0 +1,192 @@
+"""
+Analyse par lots de vidéos d'entraînement
+Les vidéos d'un dossier (ou d'un motif glob) sont réparties sur un pool de
+processus; chaque vidéo produit un rapport JSON et un manifeste permet de
+reprendre un lot interrompu sans refaire les vidéos déjà terminées
+Usage: python batch_analysis.py dossier_ou_motif [-o dossier_resultats] [--workers N]
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import cv2
+from ball_tracking_video import analyze_video_headless
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".m4v")
+MANIFEST_NAME = "manifest.json"
+
+
+def collect_videos(source):
+    """
+    Liste les vidéos d'un dossier, ou les fichiers correspondant à un motif glob
+    Retourne des chemins absolus triés
+    """
+    if os.path.isdir(source):
+        paths = [os.path.join(source, name) for name in os.listdir(source)
+                 if name.lower().endswith(VIDEO_EXTENSIONS)]
+    else:
+        paths = [path for path in glob.glob(source) if os.path.isfile(path)]
+    return sorted(os.path.abspath(path) for path in paths)
+
+
+def file_signature(path):
+    """
+    Taille et date de modification d'un fichier (détecte une vidéo remplacée)
+    """
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def load_manifest(manifest_path):
+    """
+    Charge le manifeste d'un lot précédent (dict vide s'il n'existe pas)
+    """
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, manifest_path):
+    """
+    Écrit le manifeste de façon atomique (jamais à moitié écrit si le lot est interrompu)
+    """
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, manifest_path)
+
+
+def is_done(entry, video_path):
+    """
+    Vrai si l'entrée du manifeste correspond à une analyse terminée de la vidéo actuelle
+    """
+    if entry is None or entry.get("status") != "done":
+        return False
+    signature = file_signature(video_path)
+    return (entry.get("size") == signature["size"] and entry.get("mtime") == signature["mtime"]
+            and os.path.exists(entry.get("result", "")))
+
+
+def result_paths(videos, output_dir):
+    """
+    Associe à chaque vidéo un fichier JSON de résultat (nom de la vidéo, suffixé si doublon)
+    """
+    paths = {}
+    used = set()
+    for video_path in videos:
+        stem = os.path.splitext(os.path.basename(video_path))[0]
+        name = stem
+        index = 2
+        while name in used:
+            name = f"{stem}_{index}"
+            index += 1
+        used.add(name)
+        paths[video_path] = os.path.join(output_dir, name + ".json")
+    return paths
+
+
+def _init_worker():
+    """
+    Un seul thread OpenCV par processus: le parallélisme vient du pool
+    """
+    cv2.setNumThreads(1)
+
+
+def _analyze_file(task):
+    """
+    Analyse une vidéo dans un processus du pool et écrit son rapport JSON
+    Retourne (video_path, rapport ou None, message d'erreur ou None)
+    """
+    video_path, json_path, pixels_per_meter, color_profile = task
+    try:
+        report = analyze_video_headless(video_path, pixels_per_meter=pixels_per_meter,
+                                        color_profile=color_profile, verbose=False)
+        if report is None:
+            return video_path, None, "vidéo illisible"
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        return video_path, report, None
+    except Exception as e:
+        return video_path, None, str(e)
+
+
+def run_batch(source, output_dir="resultats", workers=None, pixels_per_meter=100,
+              color_profile="orange", force=False, verbose=True):
+    """
+    Analyse toutes les vidéos de source (dossier ou motif glob) en parallèle
+    Les rapports sont écrits dans output_dir avec un manifeste (manifest.json)
+    mis à jour après chaque vidéo; les vidéos déjà analysées (même taille et
+    même date de modification) sont sautées, sauf si force=True
+    workers: nombre de processus (None = nombre de cœurs)
+    Retourne un résumé: {"analyzed": [...], "skipped": [...], "failed": {...}}
+    """
+    videos = collect_videos(source)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    json_paths = result_paths(videos, output_dir)
+    
+    summary = {"analyzed": [], "skipped": [], "failed": {}}
+    tasks = []
+    for video_path in videos:
+        if not force and is_done(manifest.get(video_path), video_path):
+            summary["skipped"].append(video_path)
+        else:
+            tasks.append((video_path, json_paths[video_path], pixels_per_meter, color_profile))
+    
+    workers = workers or os.cpu_count() or 1
+    if verbose:
+        print(f"📂 {len(videos)} vidéos trouvées, {len(summary['skipped'])} déjà analysées, "
+              f"{len(tasks)} à traiter sur {workers} processus")
+    if not tasks:
+        return summary
+    
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_init_worker) as executor:
+        futures = [executor.submit(_analyze_file, task) for task in tasks]
+        for done, future in enumerate(as_completed(futures), 1):
+            video_path, report, error = future.result()
+            entry = file_signature(video_path)
+            if error is None:
+                entry.update(status="done", result=json_paths[video_path])
+                summary["analyzed"].append(video_path)
+                if verbose:
+                    print(f"✅ [{done}/{len(tasks)}] {os.path.basename(video_path)}: "
+                          f"max {report['max_speed_kmh']:.1f} km/h")
+            else:
+                entry.update(status="failed", error=error)
+                summary["failed"][video_path] = error
+                if verbose:
+                    print(f"❌ [{done}/{len(tasks)}] {os.path.basename(video_path)}: {error}")
+            manifest[video_path] = entry
+            save_manifest(manifest, manifest_path)
+    
+    if verbose:
+        print(f"⏱️  {len(tasks)} vidéos en {time.perf_counter() - start:.1f}s")
+    return summary
+
+
+def main(argv=None):
+    """
+    Analyse par lots en ligne de commande
+    """
+    parser = argparse.ArgumentParser(description="Analyse de balle sur un lot de vidéos")
+    parser.add_argument("source", help="Dossier de vidéos ou motif glob (ex: \"clips/*.mp4\")")
+    parser.add_argument("-o", "--output", default="resultats", help="Dossier des rapports JSON et du manifeste")
+    parser.add_argument("--workers", type=int, help="Nombre de processus (défaut: nombre de cœurs)")
+    parser.add_argument("--ppm", type=float, default=100, help="Calibration en pixels par mètre")
+    parser.add_argument("--profile", default="orange", help="Profil de couleur de la balle")
+    parser.add_argument("--force", action="store_true", help="Réanalyser aussi les vidéos déjà terminées")
+    args = parser.parse_args(argv)
+    
+    summary = run_batch(args.source, args.output, args.workers, pixels_per_meter=args.ppm,
+                        color_profile=args.profile, force=args.force)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Segmentation de couleur par table de correspondance (LUT) BGR -> masque
+Les seuils HSV courants sont précalculés dans une table 3D quantifiée,
+reconstruite uniquement quand les seuils changent: le masque s'obtient par
+une simple lecture de table, sans conversion BGR -> HSV de la frame complète
+La lecture de table pixel par pixel reste 3 à 4 fois plus lente que
+cvtColor + inRange sur une frame 1080p: ce moteur ne sert qu'au benchmark,
+le suivi en direct utilise la segmentation HSV
+"""
+import sys
+import time
+import cv2
+import numpy as np
+
+
+class ColorLUT:
+    def __init__(self, bits=6):
+        """
+        Initialise la table
+        bits: nombre de bits conservés par canal (8 = exact, 6 = table de 256 Ko)
+        """
+        self.bits = bits
+        self.table = None
+        self.thresholds = None  # Seuils (lower, upper) utilisés pour construire la table
+    
+    def update(self, lower, upper):
+        """
+        Reconstruit la table si les seuils HSV ont changé
+        Retourne True si la table a été reconstruite
+        """
+        thresholds = (tuple(int(v) for v in lower), tuple(int(v) for v in upper))
+        if thresholds == self.thresholds:
+            return False
+        
+        # Une couleur représentative (centre de l'intervalle) par case de la table
+        shift = 8 - self.bits
+        levels = (np.arange(1 << self.bits, dtype=np.uint16) << shift) + ((1 << shift) >> 1)
+        b, g, r = np.meshgrid(levels, levels, levels, indexing='ij')
+        colors = np.stack([b.ravel(), g.ravel(), r.ravel()], axis=1).astype(np.uint8)
+        
+        hsv = cv2.cvtColor(colors.reshape(-1, 1, 3), cv2.COLOR_BGR2HSV)
+        self.table = cv2.inRange(hsv, np.array(lower), np.array(upper)).ravel()
+        self.thresholds = thresholds
+        return True
+    
+    def apply(self, frame):
+        """
+        Calcule le masque (0/255) d'une frame BGR par lecture de la table
+        """
+        shift = 8 - self.bits
+        b, g, r = cv2.split(frame)
+        index = (b >> shift).astype(np.uint32) << (2 * self.bits)
+        index |= (g >> shift).astype(np.uint32) << self.bits
+        index |= r >> shift
+        return np.take(self.table, index)
+
+
+def benchmark_segmentation(frames, tracker, repeats=3):
+    """
+    Compare les moteurs de segmentation HSV et LUT d'un BallTracker
+    frames: liste de frames BGR
+    Retourne un dict avec le temps moyen par frame (ms) de chaque moteur
+    et la proportion de pixels où les deux masques concordent
+    """
+    previous = tracker.segmentation
+    results = {}
+    masks = {}
+    for engine in ("hsv", "lut"):
+        tracker.segmentation = engine
+        tracker.segment(frames[0])  # Construction de la table hors chronométrage
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for frame in frames:
+                tracker.segment(frame)
+        results[f"{engine}_ms"] = (time.perf_counter() - start) * 1000 / (repeats * len(frames))
+        masks[engine] = [tracker.segment(frame)[0] for frame in frames]
+    tracker.segmentation = previous
+    
+    equal = sum(int(np.count_nonzero(a == b)) for a, b in zip(masks["hsv"], masks["lut"]))
+    total = sum(mask.size for mask in masks["hsv"])
+    results["agreement"] = equal / total
+    return results
+
+
+def main():
+    """
+    Benchmark des moteurs de segmentation sur une vidéo (ou des frames aléatoires)
+    Usage: python color_lut.py [video] [nombre_de_frames]
+    """
+    from ball_tracking import BallTracker
+    
+    max_frames = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    frames = []
+    if len(sys.argv) > 1:
+        cap = cv2.VideoCapture(sys.argv[1])
+        while len(frames) < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+    if not frames:
+        print("ℹ️  Aucune vidéo fournie: frames aléatoires 1920x1080")
+        rng = np.random.default_rng(0)
+        frames = [rng.integers(0, 256, (1080, 1920, 3), dtype=np.uint8) for _ in range(5)]
+    
+    tracker = BallTracker()
+    print(f"⏱️  Benchmark segmentation ({len(frames)} frames, {frames[0].shape[1]}x{frames[0].shape[0]})")
+    for bits in (5, 6, 8):
+        tracker.color_lut = ColorLUT(bits=bits)
+        results = benchmark_segmentation(frames, tracker)
+        print(f"   LUT {bits} bits: {results['lut_ms']:.2f} ms/frame | "
+              f"HSV: {results['hsv_ms']:.2f} ms/frame | "
+              f"concordance: {results['agreement']:.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Cache disque des détections de balle frame par frame
+La clé combine l'empreinte SHA-256 du fichier vidéo et les paramètres du
+détecteur: une vidéo réanalysée avec les mêmes réglages est relue depuis le
+cache au lieu de relancer la vision par ordinateur. La calibration
+(pixels_per_meter) n'en fait pas partie: les vitesses sont recalculées à la relecture
+La taille totale est bornée, les entrées les moins récemment utilisées sont supprimées
+"""
+import hashlib
+import json
+import os
+import zipfile
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".hockey_trainer", "cache")
+
+# Paramètres du BallTracker qui changent le résultat de la détection
+DETECTOR_PARAMS = ("hue_min", "hue_max", "sat_min", "val_min", "min_circularity", "min_area",
+                   "min_radius", "max_radius", "cleanup", "selection", "segmentation",
+                   "pyramid_scale", "pyramid_min_radius", "use_roi", "roi_margin", "roi_max_misses",
+                   "use_kalman", "max_gap_frames")
+
+# Réglages du filtre de Kalman (BallKalmanFilter) et du pré-filtre de mouvement (MotionDetector)
+KALMAN_PARAMS = ("process_noise", "measurement_noise", "gate_threshold",
+                 "initial_velocity_std", "initial_acceleration_std")
+MOTION_PARAMS = ("threshold", "min_area", "blur_size", "downscale", "margin")
+
+# Tableaux d'une entrée du cache
+ENTRY_FIELDS = ("frames", "positions", "num_contours", "total_frames", "fps")
+
+
+def video_hash(video_path, chunk_size=1 << 20):
+    """
+    Empreinte SHA-256 du contenu d'un fichier vidéo
+    """
+    digest = hashlib.sha256()
+    with open(video_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def detector_params(tracker, **extra):
+    """
+    Paramètres de détection d'un BallTracker (dict sérialisable)
+    extra: autres réglages de l'analyse qui influencent les détections (ex: pas adaptatif)
+    """
+    params = {name: getattr(tracker, name) for name in DETECTOR_PARAMS}
+    params["kalman"] = {name: getattr(tracker.kalman, name) for name in KALMAN_PARAMS}
+    params["lut_bits"] = tracker.color_lut.bits
+    params["motion_gate"] = None
+    if tracker.motion_gate is not None:
+        params["motion_gate"] = {name: getattr(tracker.motion_gate, name) for name in MOTION_PARAMS}
+    params.update(extra)
+    return params
+
+
+class DetectionCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=500 * 1024 * 1024):
+        """
+        Initialise le cache
+        cache_dir: dossier des entrées (créé si besoin)
+        max_bytes: taille totale maximale des entrées sur disque
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    def key(self, video_path, params):
+        """
+        Clé d'une analyse: empreinte de la vidéo + paramètres du détecteur
+        """
+        payload = video_hash(video_path) + json.dumps(params, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def path(self, key):
+        """
+        Fichier d'une entrée du cache
+        """
+        return os.path.join(self.cache_dir, key + ".npz")
+    
+    def get(self, key):
+        """
+        Relit une entrée: dict avec "frames", "positions" (N, 3; -1 si balle absente),
+        "num_contours", "total_frames" et "fps", ou None si absente
+        """
+        path = self.path(key)
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+        try:
+            with np.load(path) as data:
+                entry = {name: data[name] for name in ENTRY_FIELDS}
+            entry["total_frames"] = int(entry["total_frames"])
+            entry["fps"] = float(entry["fps"])
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            # Entrée corrompue (écriture interrompue, tableau manquant): ignorée puis remplacée
+            os.remove(path)
+            self.misses += 1
+            return None
+        
+        os.utime(path)  # Entrée récemment utilisée (ordre LRU)
+        self.hits += 1
+        return entry
+    
+    def put(self, key, frames, positions, num_contours, total_frames, fps):
+        """
+        Enregistre les détections d'une analyse puis fait de la place si besoin
+        frames: numéros des frames analysées
+        positions: (x, y, radius) ou None pour chaque frame analysée
+        num_contours: nombre de contours de chaque frame analysée
+        """
+        positions = np.array([p if p is not None else (-1, -1, -1) for p in positions],
+                             dtype=np.int32).reshape(-1, 3)
+        tmp_path = self.path(key) + ".tmp.npz"
+        np.savez_compressed(tmp_path, frames=np.asarray(frames, dtype=np.int64), positions=positions,
+                            num_contours=np.asarray(num_contours, dtype=np.int32),
+                            total_frames=total_frames, fps=fps)
+        os.replace(tmp_path, self.path(key))
+        self.evict()
+    
+    def evict(self):
+        """
+        Supprime les entrées les moins récemment utilisées au-delà de max_bytes
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".npz") and not name.endswith(".tmp.npz"):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+    
+    def clear(self):
+        """
+        Vide le cache
+        """
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".npz"):
+                os.remove(os.path.join(self.cache_dir, name))
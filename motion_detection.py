@@ -1,43 +1,159 @@
+"""
+Détection de mouvement par différence d'images
+MotionDetector sert de pré-filtre peu coûteux: les traitements lourds
+(segmentation de couleur, posture MediaPipe) ne tournent que sur les frames,
+ou les zones, où quelque chose bouge
+"""
 import cv2
 import numpy as np
 
-cap = cv2.VideoCapture(0)
 
-# Lire la première frame pour référence
-ret, frame1 = cap.read()
-frame1_gray = cv2.cvtColor(frame1, cv2.COLOR_BGR2GRAY)
-frame1_gray = cv2.GaussianBlur(frame1_gray, (21, 21), 0)
+class MotionDetector:
+    def __init__(self, threshold=25, min_area=500, blur_size=21, downscale=4, margin=20):
+        """
+        Initialise le détecteur de mouvement
+        threshold: écart de niveau de gris minimal pour qu'un pixel soit en mouvement
+        min_area: aire minimale d'une zone de mouvement (pixels de la frame complète)
+        blur_size: taille du flou gaussien (pleine résolution) avant la différence
+        downscale: facteur de réduction de l'image comparée (1 = pleine résolution)
+        margin: marge ajoutée autour de la zone de mouvement (pixels)
+        """
+        self.threshold = threshold
+        self.min_area = min_area
+        self.blur_size = blur_size
+        self.downscale = max(1, int(downscale))
+        self.margin = margin
 
-while True:
-    ret, frame2 = cap.read()
-    if not ret:
-        break
+        self.previous = None  # Image de référence (gris, réduite, floutée)
+        self.boxes = []  # Zones de mouvement (x, y, w, h) de la dernière frame
+        self.moving = True
+        self.last_frame_id = None
 
-    frame2_gray = cv2.cvtColor(frame2, cv2.COLOR_BGR2GRAY)
-    frame2_gray = cv2.GaussianBlur(frame2_gray, (21, 21), 0)
+        # Statistiques: frames et pixels que les traitements lourds peuvent sauter
+        self.frames_total = 0
+        self.frames_static = 0
+        self.pixels_total = 0
+        self.pixels_skipped = 0
 
-    # Calculer la différence entre les deux frames
-    diff = cv2.absdiff(frame1_gray, frame2_gray)
-    _, thresh = cv2.threshold(diff, 25, 255, cv2.THRESH_BINARY)
+    def prepare(self, frame):
+        """
+        Image réduite, en niveaux de gris et floutée, prête à être comparée
+        """
+        if frame.ndim == 3:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        else:
+            gray = frame
+        if self.downscale > 1:
+            height, width = gray.shape
+            gray = cv2.resize(gray, (max(1, width // self.downscale), max(1, height // self.downscale)),
+                              interpolation=cv2.INTER_AREA)
+        # Le flou est ramené à l'échelle de l'image réduite (taille impaire)
+        blur = max(1, (self.blur_size // self.downscale) | 1)
+        return cv2.GaussianBlur(gray, (blur, blur), 0)
 
-    # Trouver les zones de mouvement
-    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    def detect(self, frame, frame_id=None):
+        """
+        Compare la frame à la précédente
+        Retourne la liste des zones de mouvement (x, y, w, h) en coordonnées de la frame
+        La première frame est considérée comme entièrement en mouvement
+        frame_id: identifiant de la frame (ex: son instant); un second appel avec le
+                  même identifiant retourne le résultat déjà calculé (gate partagé)
+        """
+        if frame_id is not None and frame_id == self.last_frame_id:
+            return self.boxes
+        self.last_frame_id = frame_id
+        current = self.prepare(frame)
+        height, width = frame.shape[:2]
 
-    for contour in contours:
-        if cv2.contourArea(contour) < 500:  # ignorer les petits mouvements
-            continue
+        if self.previous is None or self.previous.shape != current.shape:
+            self.boxes = [(0, 0, width, height)]
+        else:
+            diff = cv2.absdiff(self.previous, current)
+            _, thresh = cv2.threshold(diff, self.threshold, 255, cv2.THRESH_BINARY)
 
-        (x, y, w, h) = cv2.boundingRect(contour)
-        cv2.rectangle(frame2, (x, y), (x + w, y + h), (0, 255, 0), 2)
-        cv2.putText(frame2, "MOUVEMENT", (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+            # Zones de mouvement (l'aire minimale est ramenée à l'échelle réduite)
+            contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            min_area = self.min_area / (self.downscale * self.downscale)
+            scale = self.downscale
+            self.boxes = [tuple(v * scale for v in cv2.boundingRect(c))
+                          for c in contours if cv2.contourArea(c) >= min_area]
+        self.previous = current
+        self.moving = len(self.boxes) > 0
 
-    cv2.imshow("Détection de mouvement", frame2)
+        region = self.region((height, width))
+        covered = (region[2] - region[0]) * (region[3] - region[1]) if region is not None else 0
+        self.frames_total += 1
+        self.frames_static += 0 if self.moving else 1
+        self.pixels_total += width * height
+        self.pixels_skipped += width * height - covered
+        return self.boxes
 
-    # Met à jour la frame de référence
-    frame1_gray = frame2_gray
+    def region(self, frame_shape):
+        """
+        Rectangle (x0, y0, x1, y1) englobant toutes les zones de mouvement, avec la marge
+        None si rien ne bouge
+        """
+        if not self.boxes:
+            return None
+        boxes = np.array(self.boxes)
+        frame_height, frame_width = frame_shape[:2]
+        x0 = max(0, int(boxes[:, 0].min()) - self.margin)
+        y0 = max(0, int(boxes[:, 1].min()) - self.margin)
+        x1 = min(frame_width, int((boxes[:, 0] + boxes[:, 2]).max()) + self.margin)
+        y1 = min(frame_height, int((boxes[:, 1] + boxes[:, 3]).max()) + self.margin)
+        return (x0, y0, x1, y1)
 
-    if cv2.waitKey(10) & 0xFF == ord('q'):
-        break
+    @property
+    def skipped_frame_fraction(self):
+        """
+        Proportion des frames sans mouvement
+        """
+        return self.frames_static / self.frames_total if self.frames_total else 0.0
 
-cap.release()
-cv2.destroyAllWindows()
+    @property
+    def skipped_pixel_fraction(self):
+        """
+        Proportion des pixels hors des zones de mouvement
+        """
+        return self.pixels_skipped / self.pixels_total if self.pixels_total else 0.0
+
+    def reset(self):
+        """
+        Oublie l'image de référence (la prochaine frame sera considérée en mouvement)
+        """
+        self.previous = None
+        self.boxes = []
+        self.moving = True
+        self.last_frame_id = None
+
+
+def main():
+    """
+    Affiche les zones de mouvement de la webcam
+    """
+    cap = cv2.VideoCapture(0)
+    detector = MotionDetector()
+
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        # Trouver les zones de mouvement
+        for (x, y, w, h) in detector.detect(frame):
+            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+            cv2.putText(frame, "MOUVEMENT", (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+
+        cv2.imshow("Détection de mouvement", frame)
+
+        if cv2.waitKey(10) & 0xFF == ord('q'):
+            break
+
+    print(f"📉 Frames sans mouvement: {detector.skipped_frame_fraction:.0%}, "
+          f"pixels hors mouvement: {detector.skipped_pixel_fraction:.0%}")
+    cap.release()
+    cv2.destroyAllWindows()
+
+
+if __name__ == "__main__":
+    main()
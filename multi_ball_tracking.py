@@ -0,0 +1,206 @@
+"""
+Suivi de plusieurs balles simultanées avec identifiants persistants
+Chaque candidat détecté par BallTracker est associé à une piste existante
+(plus proche voisin glouton sur une matrice de distances vectorisée)
+"""
+import cv2
+import numpy as np
+from collections import deque
+from ball_tracking import BallTracker, calculate_speed_kmh
+
+
+class BallTrack:
+    def __init__(self, track_id, position, radius, timestamp, max_positions=30):
+        """
+        Piste d'une balle: trajectoire, vitesse et durée de vie
+        """
+        self.track_id = track_id
+        self.positions = deque([position], maxlen=max_positions)
+        self.timestamps = deque([timestamp], maxlen=max_positions)
+        self.radius = radius
+        self.speed_kmh = 0.0
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.hits = 1  # Nombre de frames où la balle a été détectée
+        self.misses = 0  # Nombre de frames consécutives sans détection
+    
+    def predict_position(self):
+        """
+        Position attendue dans la prochaine frame (vitesse constante)
+        """
+        x, y = self.positions[-1]
+        if len(self.positions) >= 2:
+            prev_x, prev_y = self.positions[-2]
+            steps = 1 + self.misses
+            x, y = x + (x - prev_x) * steps, y + (y - prev_y) * steps
+        return (x, y)
+    
+    def lifetime(self):
+        """
+        Durée de vie de la piste en secondes
+        """
+        return self.last_seen - self.first_seen
+
+
+class MultiBallTracker:
+    def __init__(self, max_positions=30, max_tracks=20, max_distance=80, max_misses=5):
+        """
+        Initialise le suivi multi-balles
+        max_tracks: nombre maximum de pistes simultanées
+        max_distance: distance maximale (pixels) entre la prédiction et un candidat
+        max_misses: nombre de frames sans détection avant de supprimer une piste
+        """
+        self.detector = BallTracker(max_positions=max_positions)
+        self.max_positions = max_positions
+        self.max_tracks = max_tracks
+        self.max_distance = max_distance
+        self.max_misses = max_misses
+        self.tracks = []
+        self.next_track_id = 1
+    
+    @property
+    def pixels_per_meter(self):
+        return self.detector.pixels_per_meter
+    
+    @pixels_per_meter.setter
+    def pixels_per_meter(self, value):
+        self.detector.pixels_per_meter = value
+    
+    def associate(self, candidates):
+        """
+        Associe les candidats aux pistes existantes
+        candidates: tableau (M, 2) des positions des candidats
+        Retourne une liste de paires (indice de piste, indice de candidat)
+        """
+        if len(self.tracks) == 0 or len(candidates) == 0:
+            return []
+        
+        predictions = np.array([track.predict_position() for track in self.tracks], dtype=np.float64)
+        distances = np.linalg.norm(predictions[:, None, :] - candidates[None, :, :], axis=2)
+        
+        # Plus proche voisin glouton: les paires les plus proches sont servies en premier
+        track_indices, candidate_indices = np.nonzero(distances <= self.max_distance)
+        order = np.argsort(distances[track_indices, candidate_indices], kind='stable')
+        
+        matches = []
+        used_tracks = set()
+        used_candidates = set()
+        for k in order:
+            t, c = int(track_indices[k]), int(candidate_indices[k])
+            if t in used_tracks or c in used_candidates:
+                continue
+            matches.append((t, c))
+            used_tracks.add(t)
+            used_candidates.add(c)
+        return matches
+    
+    def update(self, frame, timestamp=None, frame_index=None):
+        """
+        Met à jour toutes les pistes avec une nouvelle frame
+        timestamp / frame_index: temps média de la frame (voir BallTracker.update)
+        Retourne (liste des pistes vues dans cette frame, masque)
+        """
+        detection = self.detector.detect(frame)
+        current_time = self.detector.resolve_timestamp(timestamp, frame_index)
+        candidates = detection.candidates
+        positions = np.array([(c['x'], c['y']) for c in candidates], dtype=np.float64).reshape(-1, 2)
+        
+        matches = self.associate(positions)
+        matched_tracks = set()
+        matched_candidates = set()
+        for t, c in matches:
+            track = self.tracks[t]
+            candidate = candidates[c]
+            track.positions.append((int(candidate['x']), int(candidate['y'])))
+            track.timestamps.append(current_time)
+            track.radius = int(candidate['radius'])
+            track.last_seen = current_time
+            track.hits += 1
+            track.misses = 0
+            track.speed_kmh = calculate_speed_kmh(track.positions, track.timestamps,
+                                                  self.detector.pixels_per_meter)
+            matched_tracks.add(t)
+            matched_candidates.add(c)
+        
+        # Pistes non associées: supprimées après max_misses frames sans détection
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.misses += 1
+        visible = [self.tracks[t] for t in sorted(matched_tracks)]
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+        
+        # Candidats non associés: nouvelles pistes (par score décroissant)
+        for c, candidate in enumerate(candidates):
+            if c in matched_candidates or len(self.tracks) >= self.max_tracks:
+                continue
+            track = BallTrack(self.next_track_id, (int(candidate['x']), int(candidate['y'])),
+                              int(candidate['radius']), current_time, self.max_positions)
+            self.next_track_id += 1
+            self.tracks.append(track)
+            visible.append(track)
+        
+        return visible, detection.mask
+    
+    def draw_tracks(self, frame):
+        """
+        Dessine les trajectoires, identifiants et vitesses des pistes visibles
+        """
+        for track in self.tracks:
+            if track.misses > 0:
+                continue
+            for i in range(1, len(track.positions)):
+                cv2.line(frame, track.positions[i-1], track.positions[i], (0, 255, 255), 2)
+            
+            x, y = track.positions[-1]
+            cv2.circle(frame, (x, y), track.radius, (0, 255, 0), 2)
+            cv2.putText(frame, f"#{track.track_id} {track.speed_kmh:.1f} km/h",
+                       (x - 40, y - track.radius - 10),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+
+
+def main():
+    """
+    Programme principal pour tester le suivi multi-balles à la webcam
+    """
+    cap = cv2.VideoCapture(0)
+    
+    if not cap.isOpened():
+        print("❌ Impossible d'accéder à la caméra")
+        return
+    
+    print("📹 Suivi multi-balles")
+    print("📝 Touches:")
+    print("  - 'q': Quitter")
+    print("  - 'r': Réinitialiser les pistes")
+    
+    tracker = MultiBallTracker()
+    
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            print("Erreur de capture")
+            break
+        
+        visible, mask = tracker.update(frame)
+        tracker.draw_tracks(frame)
+        
+        cv2.putText(frame, f"Balles suivies: {len(visible)}", (10, 30),
+                   cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        
+        cv2.imshow("Suivi multi-balles - Hockey Trainer", frame)
+        cv2.imshow("Masque de couleur", mask)
+        
+        key = cv2.waitKey(1) & 0xFF
+        if key == ord('q'):
+            break
+        elif key == ord('r'):
+            tracker = MultiBallTracker()
+            print("🔄 Pistes réinitialisées")
+    
+    cap.release()
+    cv2.destroyAllWindows()
+    print("👋 Application fermée")
+
+
+if __name__ == "__main__":
+    main()
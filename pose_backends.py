@@ -0,0 +1,163 @@
+"""
+Moteurs de détection de posture
+Un profil choisit le modèle MediaPipe Pose (lite, full, heavy) et ses seuils de
+confiance, ou désactive la posture (none: suivi de balle seul). Le benchmark
+mesure la latence de chaque profil et sa concordance avec le modèle heavy sur
+une vidéo de référence, pour retenir le profil le plus rapide qui reste assez
+précis sur la machine de déploiement
+Usage: python pose_backends.py [video] [nombre_de_frames]
+"""
+import sys
+import time
+import cv2
+import mediapipe as mp
+import numpy as np
+
+# Profils de posture: paramètres de mp.solutions.pose.Pose (None = pas de posture)
+POSE_PROFILES = {
+    "lite": {"model_complexity": 0, "min_detection_confidence": 0.5, "min_tracking_confidence": 0.5},
+    "full": {"model_complexity": 1, "min_detection_confidence": 0.5, "min_tracking_confidence": 0.5},
+    "heavy": {"model_complexity": 2, "min_detection_confidence": 0.5, "min_tracking_confidence": 0.5},
+    "none": None,
+}
+DEFAULT_POSE_PROFILE = "full"
+
+
+class PoseEstimate:
+    def __init__(self, pose_landmarks):
+        """
+        Résultat de posture hors MediaPipe (posture estimée ou absente),
+        même interface que les résultats de pose.process
+        pose_landmarks: NormalizedLandmarkList ou None
+        """
+        self.pose_landmarks = pose_landmarks
+
+
+class NoPose:
+    """
+    Moteur sans posture (profil none): aucun landmark, seul le suivi de balle compte
+    """
+    def process(self, image):
+        return PoseEstimate(None)
+    
+    def close(self):
+        pass
+
+
+def create_pose(profile=DEFAULT_POSE_PROFILE, **overrides):
+    """
+    Crée le moteur de posture d'un profil
+    
+    Args:
+        profile: Nom du profil (voir POSE_PROFILES)
+        overrides: Paramètres remplaçant ceux du profil (ex: min_detection_confidence)
+    
+    Returns:
+        Objet avec process(image_rgb) et close()
+    """
+    if profile not in POSE_PROFILES:
+        raise ValueError(f"Profil de posture inconnu: {profile} (disponibles: {', '.join(POSE_PROFILES)})")
+    if POSE_PROFILES[profile] is None:
+        return NoPose()
+    params = dict(POSE_PROFILES[profile])
+    params.update(overrides)
+    return mp.solutions.pose.Pose(**params)
+
+
+def landmark_points(results):
+    """
+    Landmarks (x, y) normalisés d'un résultat de posture, tableau (33, 2), ou None
+    """
+    if not results.pose_landmarks:
+        return None
+    return np.array([(lm.x, lm.y) for lm in results.pose_landmarks.landmark])
+
+
+def benchmark_pose_profiles(frames, profiles=("lite", "full", "heavy"), reference="heavy", threshold=0.05):
+    """
+    Compare la latence et la précision des profils de posture
+    frames: liste de frames BGR (extrait d'une vidéo de référence)
+    reference: profil servant de vérité terrain
+    threshold: distance normalisée en deçà de laquelle un landmark concorde
+    Retourne un dict par profil: temps moyen par frame (ms), proportion de frames
+    avec un joueur, puis face à la référence: frames où la présence du joueur
+    concorde, landmarks concordants et erreur moyenne (frames où les deux le voient);
+    "error" si le modèle n'a pas pu être chargé (ex: téléchargement impossible)
+    """
+    rgb_frames = [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in frames]
+    profiles = list(profiles) + ([reference] if reference not in profiles else [])
+    results = {}
+    points = {}
+    for profile in profiles:
+        try:
+            pose = create_pose(profile)
+            pose.process(rgb_frames[0])  # Chargement du modèle hors chronométrage
+            pose.close()
+            pose = create_pose(profile)
+        except Exception as e:
+            results[profile] = {"error": str(e)}
+            continue
+        
+        start = time.perf_counter()
+        points[profile] = [landmark_points(pose.process(image)) for image in rgb_frames]
+        elapsed = time.perf_counter() - start
+        pose.close()
+        
+        detected = sum(p is not None for p in points[profile])
+        results[profile] = {"latency_ms": elapsed * 1000 / len(frames), "detection_rate": detected / len(frames)}
+    
+    if reference not in points:
+        return results
+    for profile in points:
+        pairs = list(zip(points[profile], points[reference]))
+        both = [(p, r) for p, r in pairs if p is not None and r is not None]
+        results[profile]["presence_agreement"] = sum((p is None) == (r is None) for p, r in pairs) / len(pairs)
+        if both:
+            distances = np.concatenate([np.linalg.norm(p - r, axis=1) for p, r in both])
+            results[profile]["landmark_agreement"] = float(np.mean(distances < threshold))
+            results[profile]["mean_error"] = float(distances.mean())
+        else:
+            results[profile]["landmark_agreement"] = None
+            results[profile]["mean_error"] = None
+    return results
+
+
+def main():
+    """
+    Benchmark des profils de posture sur une vidéo (ou des frames aléatoires)
+    Usage: python pose_backends.py [video] [nombre_de_frames]
+    """
+    max_frames = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    frames = []
+    if len(sys.argv) > 1:
+        cap = cv2.VideoCapture(sys.argv[1])
+        while len(frames) < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+    if not frames:
+        print("ℹ️  Aucune vidéo fournie: frames aléatoires 1280x720 (aucun joueur, latence seule)")
+        rng = np.random.default_rng(0)
+        frames = [rng.integers(0, 256, (720, 1280, 3), dtype=np.uint8) for _ in range(10)]
+    
+    print(f"⏱️  Benchmark posture ({len(frames)} frames, {frames[0].shape[1]}x{frames[0].shape[0]}, "
+          f"référence: heavy)")
+    results = benchmark_pose_profiles(frames)
+    for profile, result in results.items():
+        if "error" in result:
+            print(f"   {profile}: ❌ modèle indisponible ({result['error']})")
+            continue
+        line = (f"   {profile}: {result['latency_ms']:.1f} ms/frame | "
+                f"joueur vu: {result['detection_rate']:.0%}")
+        if "presence_agreement" in result:
+            line += f" | présence: {result['presence_agreement']:.0%}"
+        if result.get("landmark_agreement") is not None:
+            line += (f" | landmarks concordants: {result['landmark_agreement']:.0%}"
+                     f" | erreur: {result['mean_error']:.3f}")
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Géométrie des landmarks de posture, vectorisée avec NumPy
+Les landmarks MediaPipe sont convertis une seule fois en tableau (33, 4)
+(x, y, z, visibility); les angles des articulations et l'inclinaison du tronc
+sont calculés en un seul appel, sur une frame (33, k) ou sur toute une
+séquence (T, 33, k) pour l'analyse hors ligne d'un clip
+"""
+import numpy as np
+
+# Articulations: (point a, sommet b, point c) en indices MediaPipe Pose
+JOINTS = {
+    "right_elbow": (12, 14, 16),  # Épaule, coude, poignet
+    "left_elbow": (11, 13, 15),
+    "right_hip": (12, 24, 26),  # Épaule, hanche, genou
+    "left_hip": (11, 23, 25),
+    "right_knee": (24, 26, 28),  # Hanche, genou, cheville
+    "left_knee": (23, 25, 27),
+}
+
+# Tronc utilisé pour l'inclinaison: épaule droite (12), hanche droite (24)
+TORSO = (12, 24)
+
+# Indices (a, b, c) de toutes les articulations, pour un calcul en un seul appel
+JOINT_INDICES = tuple(np.array(indices) for indices in zip(*JOINTS.values()))
+
+
+def landmarks_to_array(landmarks):
+    """
+    Convertit des landmarks MediaPipe en tableau (33, 4): x, y, z, visibility
+    """
+    return np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in landmarks], dtype=np.float64)
+
+
+def joint_angles(points, a, b, c):
+    """
+    Angles au sommet b formés par les points a, b, c (plan de l'image)
+    
+    Args:
+        points: Landmarks, tableau (..., 33, k) avec k >= 2 (x, y en premier)
+        a, b, c: Indices de landmarks (entiers ou tableaux d'indices de même taille)
+    
+    Returns:
+        Angles en degrés (0-180), de forme (...) ou (..., n); 0 si un segment est nul
+    """
+    x = points[..., 0]
+    y = points[..., 1]
+    ba_x, ba_y = x[..., a] - x[..., b], y[..., a] - y[..., b]
+    bc_x, bc_y = x[..., c] - x[..., b], y[..., c] - y[..., b]
+    dot_product = ba_x * bc_x + ba_y * bc_y
+    norms = np.hypot(ba_x, ba_y) * np.hypot(bc_x, bc_y)
+    
+    # Segment nul: angle 0 (division évitée plutôt que masquée)
+    degenerate = norms == 0
+    cosine_angle = np.clip(dot_product / np.where(degenerate, 1.0, norms), -1.0, 1.0)
+    return np.where(degenerate, 0.0, np.degrees(np.arccos(cosine_angle)))
+
+
+def torso_lean(points, shoulder=TORSO[0], hip=TORSO[1]):
+    """
+    Inclinaison du tronc par rapport à la verticale
+    
+    Args:
+        points: Landmarks, tableau (..., 33, k)
+        shoulder, hip: Indices de l'épaule et de la hanche
+    
+    Returns:
+        Angles en degrés (0 = vertical, 90 si épaule et hanche sont à la même hauteur)
+    """
+    dx = points[..., shoulder, 0] - points[..., hip, 0]
+    dy = points[..., shoulder, 1] - points[..., hip, 1]
+    level = dy == 0
+    angle = np.abs(np.degrees(np.arctan(dx / np.where(level, 1.0, dy))))
+    return np.where(level, 90.0, angle)
+
+
+def pose_features(points):
+    """
+    Angles de toutes les articulations de JOINTS et inclinaison du tronc
+    
+    Args:
+        points: Landmarks d'une frame (33, k) ou d'une séquence (T, 33, k)
+    
+    Returns:
+        Dict nom -> angle en degrés (scalaire pour une frame, tableau (T,) pour une séquence),
+        avec les clés de JOINTS et "torso_lean"
+    """
+    angles = joint_angles(points, *JOINT_INDICES)
+    features = dict(zip(JOINTS, np.moveaxis(angles, -1, 0)))
+    features["torso_lean"] = torso_lean(points)
+    return features
+
+
+def calculate_angle(a, b, c):
+    """
+    Calcule l'angle au point b formé par les points a, b, c
+    
+    Args:
+        a, b, c: Points avec attributs x, y (landmarks MediaPipe)
+    
+    Returns:
+        Angle en degrés (0-180)
+    """
+    points = np.array([(a.x, a.y), (b.x, b.y), (c.x, c.y)])
+    return float(joint_angles(points, 0, 1, 2))
+
+
+def torso_lean_angle(shoulder, hip):
+    """
+    Mesure l'inclinaison du tronc par rapport à la verticale
+    
+    Args:
+        shoulder: Landmark de l'épaule
+        hip: Landmark de la hanche
+    
+    Returns:
+        Angle d'inclinaison en degrés (0 = vertical)
+    """
+    points = np.array([(shoulder.x, shoulder.y), (hip.x, hip.y)])
+    return float(torso_lean(points, 0, 1))
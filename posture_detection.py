@@ -4,104 +4,33 @@ Utilise MediaPipe Pose pour détecter 33 landmarks du corps
 """
 import cv2
 import mediapipe as mp
-import numpy as np
-import math
+import sys
+from pose_backends import DEFAULT_POSE_PROFILE, create_pose
+# calculate_angle reste importable depuis ce module (géométrie partagée: pose_geometry)
+from pose_geometry import calculate_angle, landmarks_to_array, pose_features, torso_lean_angle
 
 
-def calculate_angle(a, b, c):
-    """
-    Calcule l'angle au point b formé par les points a, b, c
-    
-    Args:
-        a, b, c: Points avec attributs x, y (landmarks MediaPipe)
-    
-    Returns:
-        Angle en degrés (0-180)
-    """
-    # Convertir les coordonnées en vecteurs
-    ba = np.array([a.x - b.x, a.y - b.y])
-    bc = np.array([c.x - b.x, c.y - b.y])
-    
-    # Calculer le produit scalaire et les normes
-    dot_product = np.dot(ba, bc)
-    norm_ba = np.linalg.norm(ba)
-    norm_bc = np.linalg.norm(bc)
-    
-    # Éviter la division par zéro
-    if norm_ba == 0 or norm_bc == 0:
-        return 0
-    
-    # Calculer l'angle
-    cosine_angle = dot_product / (norm_ba * norm_bc)
-    # S'assurer que la valeur est dans [-1, 1] pour éviter les erreurs d'arrondi
-    cosine_angle = np.clip(cosine_angle, -1.0, 1.0)
-    angle = np.arccos(cosine_angle)
-    
-    return np.degrees(angle)
-
-
-def torso_lean_angle(shoulder, hip):
-    """
-    Mesure l'inclinaison du tronc par rapport à la verticale
-    
-    Args:
-        shoulder: Landmark de l'épaule
-        hip: Landmark de la hanche
-    
-    Returns:
-        Angle d'inclinaison en degrés (0 = vertical)
-    """
-    # Calculer l'angle entre la ligne épaule-hanche et la verticale
-    dx = shoulder.x - hip.x
-    dy = shoulder.y - hip.y
-    
-    # Éviter la division par zéro
-    if dy == 0:
-        return 90.0
-    
-    # Calculer l'angle par rapport à la verticale
-    angle = abs(math.degrees(math.atan(dx / dy)))
-    
-    return angle
-
-
-def classify_posture(landmarks, image_w, image_h):
+def classify_posture(landmarks, image_w, image_h, features=None):
     """
     Classifie la posture selon des règles heuristiques
     
     Args:
         landmarks: Liste des 33 landmarks MediaPipe
         image_w, image_h: Dimensions de l'image
+        features: Angles déjà calculés par pose_geometry.pose_features (None = calculés ici)
     
     Returns:
         String: "DROIT", "PENCHÉ EN AVANT", ou "ACCROUPI / BAS"
     """
-    # Récupérer les landmarks clés
-    # 11: épaule gauche, 12: épaule droite
-    # 23: hanche gauche, 24: hanche droite
-    # 25: genou gauche, 26: genou droite
-    # 27: cheville gauche, 28: cheville droite
-    
-    left_shoulder = landmarks[11]
-    right_shoulder = landmarks[12]
-    left_hip = landmarks[23]
-    right_hip = landmarks[24]
-    left_knee = landmarks[25]
-    right_knee = landmarks[26]
-    left_ankle = landmarks[27]
-    right_ankle = landmarks[28]
-    
-    # Utiliser les landmarks du côté droit pour les calculs
+    # Angles du côté droit (hanche 24, genou 26, cheville 28, épaule 12),
+    # calculés en un seul appel vectorisé
     # (on pourrait moyenner gauche/droite pour plus de robustesse)
+    if features is None:
+        features = pose_features(landmarks_to_array(landmarks))
     
-    # 1. Calculer l'angle de la hanche (épaule-hanche-genou)
-    hip_angle = calculate_angle(right_shoulder, right_hip, right_knee)
-    
-    # 2. Calculer l'angle du genou (hanche-genou-cheville)
-    knee_angle = calculate_angle(right_hip, right_knee, right_ankle)
-    
-    # 3. Calculer l'inclinaison du tronc
-    torso_angle = torso_lean_angle(right_shoulder, right_hip)
+    # Angle du genou (hanche-genou-cheville) et inclinaison du tronc
+    knee_angle = features["right_knee"]
+    torso_angle = features["torso_lean"]
     
     # Classification basée sur les seuils heuristiques
     # (Ces valeurs sont ajustables selon les besoins)
@@ -118,21 +47,22 @@ def classify_posture(landmarks, image_w, image_h):
     return "DROIT"
 
 
-def main():
+def main(pose_profile=DEFAULT_POSE_PROFILE):
     """
     Fonction principale - capture vidéo et analyse de posture en temps réel
+    Usage: python posture_detection.py [lite|full|heavy]
     """
+    if pose_profile == "none":
+        print("❌ Le profil none désactive la posture: choisir lite, full ou heavy")
+        return
+    
     # Initialiser MediaPipe Pose
     mp_pose = mp.solutions.pose
     mp_drawing = mp.solutions.drawing_utils
     mp_drawing_styles = mp.solutions.drawing_styles
     
-    # Configurer le modèle Pose
-    pose = mp_pose.Pose(
-        min_detection_confidence=0.5,
-        min_tracking_confidence=0.5,
-        model_complexity=1  # 0=lite, 1=full, 2=heavy
-    )
+    # Configurer le modèle Pose (profil de pose_backends)
+    pose = create_pose(pose_profile)
     
     # Ouvrir la webcam
     cap = cv2.VideoCapture(0)
@@ -143,7 +73,7 @@ def main():
     
     print("🏒 Détection de Posture - Hockey Trainer")
     print("=" * 50)
-    print("MediaPipe Pose activé - 33 landmarks détectés")
+    print(f"MediaPipe Pose activé ({pose_profile}) - 33 landmarks détectés")
     print("Appuyez sur 'q' pour quitter")
     print("=" * 50)
     
@@ -175,10 +105,11 @@ def main():
                 landmark_drawing_spec=mp_drawing_styles.get_default_pose_landmarks_style()
             )
             
-            # Classifier la posture
+            # Classifier la posture (angles calculés une seule fois par frame)
             landmarks = results.pose_landmarks.landmark
             image_h, image_w, _ = image.shape
-            posture = classify_posture(landmarks, image_w, image_h)
+            features = pose_features(landmarks_to_array(landmarks))
+            posture = classify_posture(landmarks, image_w, image_h, features)
             
             # Afficher la classification
             # Choisir la couleur selon la posture
@@ -202,15 +133,9 @@ def main():
             )
             
             # Afficher des informations supplémentaires
-            # Calculer quelques angles pour affichage
-            right_shoulder = landmarks[12]
-            right_hip = landmarks[24]
-            right_knee = landmarks[26]
-            right_ankle = landmarks[28]
-            
-            hip_angle = calculate_angle(right_shoulder, right_hip, right_knee)
-            knee_angle = calculate_angle(right_hip, right_knee, right_ankle)
-            torso_angle = torso_lean_angle(right_shoulder, right_hip)
+            hip_angle = features["right_hip"]
+            knee_angle = features["right_knee"]
+            torso_angle = features["torso_lean"]
             
             # Afficher les angles
             cv2.putText(
@@ -274,4 +199,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_POSE_PROFILE)
@@ -0,0 +1,118 @@
+"""
+Statistiques de vitesse en flux continu
+Moyenne, écart-type, min/max et percentiles (histogramme à pas fixe) mis à jour
+en O(1) par valeur, avec un historique borné et un export optionnel de la série
+complète sur disque
+"""
+import csv
+from collections import deque
+import numpy as np
+
+
+class SpeedStatistics:
+    def __init__(self, history_size=1000, bin_width=0.5, max_value=300.0, series_path=None):
+        """
+        Initialise les statistiques
+        history_size: nombre de valeurs récentes gardées en mémoire (None = aucune)
+        bin_width: largeur des classes de l'histogramme (km/h)
+        max_value: borne haute de l'histogramme; au-delà, classe de débordement
+        series_path: fichier CSV où écrire toute la série (frame, vitesse), ou None
+        """
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # Somme des carrés des écarts (algorithme de Welford)
+        self.min = 0.0
+        self.max = 0.0
+        
+        self.bin_width = bin_width
+        self.max_value = max_value
+        self.histogram = np.zeros(int(np.ceil(max_value / bin_width)) + 1, dtype=np.int64)
+        
+        self.history = deque(maxlen=history_size) if history_size else deque(maxlen=0)
+        
+        self.series_file = None
+        self.series_writer = None
+        if series_path:
+            self.series_file = open(series_path, 'w', newline='', encoding='utf-8')
+            self.series_writer = csv.writer(self.series_file)
+            self.series_writer.writerow(["frame", "vitesse_kmh"])
+    
+    def add(self, value, frame_number=None):
+        """
+        Ajoute une valeur de vitesse (km/h)
+        """
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if self.count == 1:
+            self.min = self.max = value
+        else:
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+        
+        index = min(int(value / self.bin_width), len(self.histogram) - 1)
+        self.histogram[max(index, 0)] += 1
+        self.history.append(value)
+        
+        if self.series_writer is not None:
+            self.series_writer.writerow([frame_number, f"{value:.3f}"])
+    
+    @property
+    def std(self):
+        """
+        Écart-type de la série
+        """
+        if self.count < 2:
+            return 0.0
+        return float(np.sqrt(self.m2 / (self.count - 1)))
+    
+    def percentile(self, p):
+        """
+        Percentile approché (précision: une classe de l'histogramme)
+        p: entre 0 et 100
+        """
+        if self.count == 0:
+            return 0.0
+        rank = p / 100.0 * self.count
+        index = int(np.searchsorted(np.cumsum(self.histogram), max(rank, 1)))
+        value = (index + 0.5) * self.bin_width
+        return float(min(max(value, self.min), self.max))
+    
+    def merge(self, other, series=None):
+        """
+        Ajoute les valeurs d'une autre série (ex: un morceau de vidéo analysé à part)
+        Les valeurs de other sont considérées comme venant après celles de self
+        (l'historique récent est complété dans cet ordre)
+        series: valeurs (frame, vitesse) de other à écrire dans le fichier de série
+        """
+        if len(other.histogram) != len(self.histogram) or other.bin_width != self.bin_width:
+            raise ValueError("Histogrammes incompatibles (bin_width ou max_value différents)")
+        
+        if other.count > 0:
+            total = self.count + other.count
+            delta = other.mean - self.mean
+            # Combinaison de deux séries de Welford (Chan et al.)
+            self.m2 += other.m2 + delta * delta * self.count * other.count / total
+            self.mean += delta * other.count / total
+            if self.count == 0:
+                self.min, self.max = other.min, other.max
+            else:
+                self.min = min(self.min, other.min)
+                self.max = max(self.max, other.max)
+            self.count = total
+            self.histogram += other.histogram
+            self.history.extend(other.history)
+        
+        if self.series_writer is not None and series is not None:
+            for frame_number, value in series:
+                self.series_writer.writerow([frame_number, f"{value:.3f}"])
+    
+    def close(self):
+        """
+        Ferme le fichier de série s'il est ouvert
+        """
+        if self.series_file is not None:
+            self.series_file.close()
+            self.series_file = None
+            self.series_writer = None
@@ -3,7 +3,11 @@ Tests pour le module de reconnaissance d'actions
 """
 import numpy as np
 import cv2
-from action_recognition import ActionRecognizer, calculate_distance
+import action_recognition
+from pose_backends import NoPose, benchmark_pose_profiles, create_pose
+from pose_geometry import calculate_angle, joint_angles, pose_features, torso_lean_angle
+from action_recognition import (ActionRecognizer, PoseEstimate, array_to_landmarks, calculate_distance,
+                                extrapolate_landmarks)
 
 
 def test_calculate_distance():
@@ -141,6 +145,257 @@ def test_reset():
     print("✅ test_reset passed")
 
 
+def test_update_annotates_in_place():
+    """Test de update: annotation sur place et tampon RGB réutilisé (aucune copie par frame)"""
+    recognizer = ActionRecognizer()
+    frame = np.full((480, 640, 3), 90, dtype=np.uint8)
+    cv2.circle(frame, (320, 240), 15, (0, 255, 255), -1)  # Balle jaune
+    
+    action, confidence, annotated = recognizer.update(frame, timestamp=0.0)
+    assert annotated is frame, "La frame doit être annotée sur place"
+    buffer = recognizer.rgb_buffer
+    
+    recognizer.update(frame, timestamp=1 / 30)
+    assert recognizer.rgb_buffer is buffer, "Le tampon RGB doit être réutilisé"
+    assert recognizer.rgb_buffer.flags.writeable
+    
+    recognizer.close()
+    print("✅ test_update_annotates_in_place passed")
+
+
+def test_motion_gate_reuses_pose():
+    """Test du pré-filtre de mouvement: posture réutilisée sur une frame immobile"""
+    recognizer = ActionRecognizer(motion_gate=True)
+    frame = np.full((480, 640, 3), 90, dtype=np.uint8)
+    
+    recognizer.update(frame.copy(), timestamp=0.0)
+    first = recognizer.last_pose_results
+    recognizer.update(frame.copy(), timestamp=1 / 30)
+    assert not recognizer.motion_gate.moving
+    assert recognizer.last_pose_results is first
+    assert recognizer.motion_gate.skipped_frame_fraction == 0.5
+    
+    recognizer.close()
+    print("✅ test_motion_gate_reuses_pose passed")
+
+
+def test_concurrent_matches_sequential():
+    """Test du mode concurrent: mêmes résultats que le mode séquentiel"""
+    frames = []
+    for i in range(5):
+        frame = np.full((480, 640, 3), 90, dtype=np.uint8)
+        cv2.circle(frame, (100 + 40 * i, 240), 12, (0, 255, 255), -1)
+        frames.append(frame)
+    
+    outputs = []
+    for concurrent in (False, True):
+        recognizer = ActionRecognizer(motion_gate=True, concurrent=concurrent)
+        results = []
+        for i, frame in enumerate(frames):
+            action, confidence, annotated = recognizer.update(frame.copy(), timestamp=i / 30)
+            results.append((action, confidence, list(recognizer.ball_tracker.positions), annotated))
+        recognizer.close()
+        outputs.append(results)
+    
+    for sequential, concurrent in zip(*outputs):
+        assert sequential[:3] == concurrent[:3]
+        assert np.array_equal(sequential[3], concurrent[3])
+    
+    print("✅ test_concurrent_matches_sequential passed")
+
+
+def test_extrapolate_landmarks():
+    """Test de l'extrapolation linéaire des landmarks entre deux détections"""
+    first = np.zeros((33, 4))
+    second = np.zeros((33, 4))
+    first[:, 0] = 0.2
+    second[:, 0] = 0.3
+    second[:, 3] = 0.9
+    
+    estimated = extrapolate_landmarks([(0.0, first), (0.1, second)], 0.15)
+    assert np.allclose(estimated[:, 0], 0.35)
+    assert np.allclose(estimated[:, 3], 0.9)  # Visibilité de la dernière détection
+    assert extrapolate_landmarks([(0.1, second)], 0.15) is second
+    
+    print("✅ test_extrapolate_landmarks passed")
+
+
+class FakePose:
+    """Posture factice: joueur centré qui se déplace vers la droite"""
+    def __init__(self):
+        self.calls = 0
+    
+    def process(self, image):
+        self.calls += 1
+        points = np.zeros((33, 4))
+        points[:, 0] = 0.4 + 0.01 * self.calls
+        points[:, 1] = 0.5
+        points[:, 3] = 1.0
+        return PoseEstimate(array_to_landmarks(points))
+    
+    def close(self):
+        pass
+
+
+def test_pose_interval():
+    """Test de la posture à fréquence réduite: extrapolée entre deux détections"""
+    recognizer = ActionRecognizer(pose_interval=3)
+    recognizer.pose = FakePose()
+    frame = np.full((480, 640, 3), 90, dtype=np.uint8)
+    
+    for i in range(9):
+        recognizer.update(frame.copy(), timestamp=i / 30)
+    assert recognizer.pose.calls == 3
+    assert recognizer.pose_estimates == 6
+    # Joueur extrapolé à la frame 9: 2 frames après la détection de la frame 7
+    assert abs(recognizer.last_player_pos[0] - (0.43 + 2 * 0.01 / 3) * 640) <= 1
+    
+    # Balle près du joueur: posture détectée à chaque frame
+    recognizer.pose.calls = 0
+    for i in range(9, 12):
+        ball_frame = frame.copy()
+        cv2.circle(ball_frame, (280 + 5 * i, 260), 12, (0, 255, 255), -1)
+        recognizer.update(ball_frame, timestamp=i / 30)
+    assert recognizer.last_ball_pos is not None
+    assert recognizer.pose.calls == 3
+    
+    recognizer.close()
+    print("✅ test_pose_interval passed")
+
+
+class BrightRegionPose:
+    """Posture factice: landmarks répartis sur la zone claire de l'image reçue"""
+    def __init__(self):
+        self.shapes = []
+    
+    def process(self, image):
+        self.shapes.append(image.shape)
+        ys, xs = np.nonzero(image[:, :, 0] > 200)
+        if len(xs) == 0:
+            return PoseEstimate(None)
+        height, width = image.shape[:2]
+        points = np.ones((33, 4))
+        points[:, 0] = np.linspace(xs.min(), xs.max(), 33) / width
+        points[:, 1] = np.linspace(ys.min(), ys.max(), 33) / height
+        return PoseEstimate(array_to_landmarks(points))
+    
+    def close(self):
+        pass
+
+
+def test_pose_crop():
+    """Test du recadrage de MediaPipe sur le joueur, avec retour à la frame entière"""
+    recognizer = ActionRecognizer(pose_crop=True)
+    recognizer.pose = BrightRegionPose()
+    frame = np.full((480, 640, 3), 90, dtype=np.uint8)
+    frame[200:300, 400:450] = 255  # Joueur
+    
+    recognizer.update(frame.copy(), timestamp=0.0)
+    recognizer.update(frame.copy(), timestamp=1 / 30)
+    assert recognizer.pose.shapes[0] == frame.shape
+    assert recognizer.pose.shapes[1][0] < 480 and recognizer.pose.shapes[1][1] < 640
+    
+    # Landmarks ramenés en coordonnées de la frame entière
+    landmarks = recognizer.last_pose_results.pose_landmarks.landmark
+    assert abs(landmarks[0].x * 640 - 400) <= 1 and abs(landmarks[32].y * 480 - 299) <= 1
+    assert recognizer.last_player_pos == recognizer.get_player_center(landmarks, 640, 480)
+    
+    # Joueur sorti du rectangle: recherche sur toute la frame
+    moved = np.full((480, 640, 3), 90, dtype=np.uint8)
+    moved[200:300, 50:100] = 255
+    recognizer.update(moved, timestamp=2 / 30)
+    assert recognizer.pose_reacquisitions == 1
+    assert recognizer.pose.shapes[-1] == frame.shape
+    assert recognizer.player_box[0] < 50
+    
+    recognizer.close()
+    print("✅ test_pose_crop passed")
+
+
+def test_landmarks_converted_once_per_frame():
+    """Test: les landmarks d'une frame ne sont convertis en tableau qu'une seule fois"""
+    calls = []
+    convert = action_recognition.landmarks_to_array
+    
+    def counting_convert(landmarks):
+        calls.append(1)
+        return convert(landmarks)
+    
+    action_recognition.landmarks_to_array = counting_convert
+    try:
+        recognizer = ActionRecognizer(pose_interval=2, pose_crop=True)
+        recognizer.pose = BrightRegionPose()
+        frame = np.full((480, 640, 3), 90, dtype=np.uint8)
+        frame[200:300, 400:450] = 255
+        for i in range(4):
+            recognizer.update(frame.copy(), timestamp=i / 30)
+        # 2 détections réelles (1 conversion chacune), 2 frames extrapolées (aucune)
+        assert recognizer.pose_runs == 2 and recognizer.pose_estimates == 2
+        assert len(calls) == 2
+        recognizer.close()
+    finally:
+        action_recognition.landmarks_to_array = convert
+    print("✅ test_landmarks_converted_once_per_frame passed")
+
+
+def test_pose_profiles():
+    """Test des profils de posture, dont le suivi de balle seul (none)"""
+    assert isinstance(create_pose("none"), NoPose)
+    try:
+        create_pose("ultra")
+        assert False, "Profil inconnu accepté"
+    except ValueError:
+        pass
+    
+    recognizer = ActionRecognizer(pose_profile="none")
+    frame = np.full((480, 640, 3), 90, dtype=np.uint8)
+    cv2.circle(frame, (300, 240), 12, (0, 255, 255), -1)
+    action, confidence, _ = recognizer.update(frame, timestamp=0.0)
+    assert recognizer.rgb_buffer is None  # Aucune conversion pour MediaPipe
+    assert recognizer.last_ball_pos is not None and recognizer.last_player_pos is None
+    recognizer.close()
+    
+    frames = [np.full((240, 320, 3), 90, dtype=np.uint8) for _ in range(3)]
+    results = benchmark_pose_profiles(frames, profiles=("full", "none"), reference="full")
+    assert results["full"]["presence_agreement"] == 1.0
+    assert results["none"]["latency_ms"] >= 0
+    assert results["none"]["landmark_agreement"] is None  # Aucun joueur sur ces frames
+    
+    print("✅ test_pose_profiles passed")
+
+
+class Point:
+    """Landmark minimal (attributs x, y)"""
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+def test_pose_geometry():
+    """Test des angles vectorisés: frame seule, séquence et API historique"""
+    assert abs(calculate_angle(Point(1, 0), Point(0, 0), Point(0, 1)) - 90) < 1e-9
+    assert abs(calculate_angle(Point(-1, 0), Point(0, 0), Point(1, 0)) - 180) < 1e-9
+    assert calculate_angle(Point(0, 0), Point(0, 0), Point(1, 0)) == 0  # Segment nul
+    assert abs(torso_lean_angle(Point(1, 0), Point(0, 1)) - 45) < 1e-9
+    assert torso_lean_angle(Point(1, 0), Point(0, 0)) == 90
+    
+    rng = np.random.default_rng(0)
+    clip = rng.random((50, 33, 3))
+    features = pose_features(clip)
+    assert features["right_elbow"].shape == (50,)
+    
+    # Même résultat que le calcul landmark par landmark, frame par frame
+    for t in (0, 17, 49):
+        landmarks = [Point(x, y) for x, y, _ in clip[t]]
+        single = pose_features(clip[t])
+        assert single["right_knee"] == features["right_knee"][t]
+        assert abs(single["right_knee"] - calculate_angle(landmarks[24], landmarks[26], landmarks[28])) < 1e-9
+        assert abs(single["torso_lean"] - torso_lean_angle(landmarks[12], landmarks[24])) < 1e-9
+        assert single["left_hip"] == joint_angles(clip[t], 11, 23, 25)
+    
+    print("✅ test_pose_geometry passed")
+
+
 def run_all_tests():
     """Exécute tous les tests"""
     print("\n🧪 Lancement des tests de reconnaissance d'actions")
@@ -154,6 +409,15 @@ def run_all_tests():
         test_classify_action_shooting()
         test_classify_action_dribbling()
         test_reset()
+        test_update_annotates_in_place()
+        test_motion_gate_reuses_pose()
+        test_concurrent_matches_sequential()
+        test_extrapolate_landmarks()
+        test_pose_interval()
+        test_pose_crop()
+        test_landmarks_converted_once_per_frame()
+        test_pose_profiles()
+        test_pose_geometry()
         
         print("=" * 60)
         print("✅ Tous les tests sont passés avec succès!")
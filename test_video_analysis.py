@@ -0,0 +1,478 @@
+"""
+Tests pour l'analyse de vidéos existantes (mode sans affichage)
+"""
+import os
+import shutil
+import tempfile
+import time
+import cv2
+import numpy as np
+from test_detection import create_test_video
+from ball_tracking_video import analyze_video_headless, analyze_video_parallel, recalibrate_tracks, run_cli
+from video_pipeline import run_pipeline
+from batch_analysis import run_batch, load_manifest
+from ball_tracking import BallTracker
+from detection_cache import DetectionCache, detector_params
+from motion_detection import MotionDetector
+import tracking_output
+from tracking_output import TrackingWriter, read_records
+
+
+def make_test_video(duration_sec=2, fps=30):
+    """Crée une vidéo de test (balle orange) dans un dossier temporaire"""
+    tmp_dir = tempfile.mkdtemp()
+    video_path = os.path.join(tmp_dir, "test_ball.mp4")
+    create_test_video(video_path, duration_sec=duration_sec, fps=fps)
+    return tmp_dir, video_path
+
+
+def make_sparse_video(frames=300, ball_start=200, ball_end=260):
+    """Crée une vidéo fixe où la balle ne passe que pendant quelques frames"""
+    tmp_dir = tempfile.mkdtemp()
+    video_path = os.path.join(tmp_dir, "sparse.mp4")
+    out = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'mp4v'), 30, (640, 480))
+    for i in range(frames):
+        frame = np.full((480, 640, 3), 255, dtype=np.uint8)
+        if ball_start <= i < ball_end:
+            cv2.circle(frame, (100 + 8 * (i - ball_start), 240), 15, (0, 140, 255), -1)
+        out.write(frame)
+    out.release()
+    return tmp_dir, video_path
+
+
+def make_slow_ball_video(frames=600):
+    """Crée une vidéo où la balle oscille lentement (quelques pixels par frame)"""
+    tmp_dir = tempfile.mkdtemp()
+    video_path = os.path.join(tmp_dir, "slow.mp4")
+    out = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'mp4v'), 30, (640, 480))
+    for i in range(frames):
+        frame = np.full((480, 640, 3), 255, dtype=np.uint8)
+        x = int(320 + 200 * np.sin(2 * np.pi * i / 240))
+        cv2.circle(frame, (x, 240), 15, (0, 140, 255), -1)
+        out.write(frame)
+    out.release()
+    return tmp_dir, video_path
+
+
+def test_headless_analysis_report():
+    """Test de l'analyse sans affichage: rapport structuré sans vidéo de sortie"""
+    tmp_dir, video_path = make_test_video()
+    
+    report = analyze_video_headless(video_path, verbose=False)
+    
+    assert report is not None
+    assert report["frames_analyzed"] == 60
+    assert report["positions_detected"] > 40, f"Trop peu de détections: {report['positions_detected']}"
+    assert 0 < report["avg_speed_kmh"] <= report["max_speed_kmh"]
+    assert report["output_path"] is None
+    shutil.rmtree(tmp_dir)
+    print("✅ test_headless_analysis_report passed")
+
+
+def test_headless_analysis_with_output():
+    """Test de l'analyse sans affichage avec vidéo annotée et rapport JSON (CLI)"""
+    tmp_dir, video_path = make_test_video(duration_sec=1)
+    output_path = os.path.join(tmp_dir, "annotated.mp4")
+    json_path = os.path.join(tmp_dir, "report.json")
+    
+    assert run_cli([video_path, "-o", output_path, "--json", json_path, "-q"]) == 0
+    
+    cap = cv2.VideoCapture(output_path)
+    assert int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) == 30
+    cap.release()
+    assert os.path.exists(json_path)
+    shutil.rmtree(tmp_dir)
+    print("✅ test_headless_analysis_with_output passed")
+
+
+def test_headless_analysis_missing_file():
+    """Test d'un fichier inexistant"""
+    assert analyze_video_headless("introuvable.mp4", verbose=False) is None
+    print("✅ test_headless_analysis_missing_file passed")
+
+
+class FakeCapture:
+    """Source de frames numérotées (imite cv2.VideoCapture.read)"""
+    def __init__(self, count, fail_at=None):
+        self.count = count
+        self.fail_at = fail_at
+        self.index = 0
+    
+    def read(self):
+        if self.index >= self.count:
+            return False, None
+        self.index += 1
+        if self.index == self.fail_at:
+            raise IOError("Erreur de décodage simulée")
+        return True, np.full((4, 4), self.index, dtype=np.int32)
+
+
+class FakeWriter:
+    """Collecte les frames écrites (imite cv2.VideoWriter.write)"""
+    def __init__(self):
+        self.frames = []
+    
+    def write(self, frame):
+        time.sleep(0.001)
+        self.frames.append(int(frame[0, 0]))
+
+
+def test_pipeline_preserves_order():
+    """Test du pipeline: toutes les frames sont écrites dans l'ordre"""
+    writer = FakeWriter()
+    seen = []
+    
+    def process_frame(frame_number, frame):
+        seen.append(frame_number)
+        assert frame[0, 0] == frame_number
+        return frame if frame_number % 3 else None  # Certaines frames ne sont pas écrites
+    
+    count = run_pipeline(FakeCapture(200), process_frame, writer, queue_size=4)
+    
+    assert count == 200
+    assert seen == list(range(1, 201))
+    assert writer.frames == [n for n in range(1, 201) if n % 3]
+    print("✅ test_pipeline_preserves_order passed")
+
+
+def test_pipeline_propagates_errors():
+    """Test du pipeline: une erreur de décodage est relancée dans l'appelant"""
+    try:
+        run_pipeline(FakeCapture(50, fail_at=20), lambda n, f: f, FakeWriter())
+        assert False, "L'erreur de décodage aurait dû être relancée"
+    except IOError:
+        pass
+    print("✅ test_pipeline_propagates_errors passed")
+
+
+def test_pipelined_analysis_matches_sequential():
+    """Test de l'analyse en pipeline: même rapport et même vidéo que l'analyse séquentielle"""
+    tmp_dir, video_path = make_test_video(duration_sec=1)
+    output_path = os.path.join(tmp_dir, "annotated.mp4")
+    
+    sequential = analyze_video_headless(video_path, verbose=False)
+    pipelined = analyze_video_headless(video_path, output_path, verbose=False, pipelined=True)
+    
+    for key in ("frames_analyzed", "positions_detected", "max_speed_kmh", "avg_speed_kmh"):
+        assert pipelined[key] == sequential[key], f"{key}: {pipelined[key]} != {sequential[key]}"
+    cap = cv2.VideoCapture(output_path)
+    assert int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) == 30
+    cap.release()
+    shutil.rmtree(tmp_dir)
+    print("✅ test_pipelined_analysis_matches_sequential passed")
+
+
+def test_parallel_analysis_matches_sequential():
+    """Test de l'analyse par morceaux en parallèle: mêmes vitesses que l'analyse séquentielle"""
+    tmp_dir, video_path = make_test_video(duration_sec=4)
+    sequential_series = os.path.join(tmp_dir, "sequential.csv")
+    parallel_series = os.path.join(tmp_dir, "parallel.csv")
+    
+    sequential = analyze_video_headless(video_path, series_path=sequential_series, verbose=False)
+    parallel = analyze_video_parallel(video_path, workers=3, series_path=parallel_series, verbose=False)
+    
+    assert parallel["workers"] == 3
+    for key in ("frames_analyzed", "positions_detected", "max_speed_kmh",
+                "median_speed_kmh", "p90_speed_kmh"):
+        assert parallel[key] == sequential[key], f"{key}: {parallel[key]} != {sequential[key]}"
+    assert abs(parallel["avg_speed_kmh"] - sequential["avg_speed_kmh"]) < 1e-9
+    with open(sequential_series, encoding='utf-8') as a, open(parallel_series, encoding='utf-8') as b:
+        assert a.read() == b.read()
+    shutil.rmtree(tmp_dir)
+    print("✅ test_parallel_analysis_matches_sequential passed")
+
+
+def test_parallel_analysis_ball_missing_at_boundary():
+    """Test de l'analyse par morceaux: balle absente pendant tout le recouvrement avant un morceau"""
+    tmp_dir = tempfile.mkdtemp()
+    video_path = os.path.join(tmp_dir, "gap.mp4")
+    out = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'mp4v'), 30, (640, 480))
+    for i in range(200):
+        frame = np.full((480, 640, 3), 255, dtype=np.uint8)
+        if i < 60 or i >= 110:  # Frontière des morceaux à la frame 100
+            cv2.circle(frame, (100 + 3 * (i % 60), 240), 15, (0, 140, 255), -1)
+        out.write(frame)
+    out.release()
+    sequential_series = os.path.join(tmp_dir, "sequential.csv")
+    parallel_series = os.path.join(tmp_dir, "parallel.csv")
+    
+    sequential = analyze_video_headless(video_path, series_path=sequential_series, verbose=False)
+    parallel = analyze_video_parallel(video_path, workers=2, overlap_frames=30,
+                                      series_path=parallel_series, verbose=False)
+    
+    assert parallel["positions_detected"] == sequential["positions_detected"]
+    assert abs(parallel["avg_speed_kmh"] - sequential["avg_speed_kmh"]) < 1e-9
+    with open(sequential_series, encoding='utf-8') as a, open(parallel_series, encoding='utf-8') as b:
+        assert a.read() == b.read()
+    shutil.rmtree(tmp_dir)
+    print("✅ test_parallel_analysis_ball_missing_at_boundary passed")
+
+
+def test_parallel_cli_rejects_unsupported_options():
+    """Test de la ligne de commande: --workers refuse les options qu'il ignorerait"""
+    for option in (["--stride", "4"], ["--motion"], ["--cache"], ["--pipeline"], ["--tracks", "t.jsonl"]):
+        try:
+            run_cli(["video.mp4", "--workers", "2", "-q"] + option)
+        except SystemExit as e:
+            assert e.code == 2
+        else:
+            raise AssertionError(f"--workers accepté avec {option[0]}")
+    print("✅ test_parallel_cli_rejects_unsupported_options passed")
+
+
+def test_batch_analysis_resumes():
+    """Test de l'analyse par lots: un rapport par vidéo et reprise sans refaire les vidéos terminées"""
+    tmp_dir, video_path = make_test_video(duration_sec=1)
+    second_path = os.path.join(tmp_dir, "second.mp4")
+    shutil.copy(video_path, second_path)
+    output_dir = os.path.join(tmp_dir, "resultats")
+    
+    summary = run_batch(tmp_dir, output_dir, workers=2, verbose=False)
+    assert len(summary["analyzed"]) == 2 and not summary["failed"]
+    for name in ("test_ball.json", "second.json"):
+        assert os.path.exists(os.path.join(output_dir, name))
+    manifest = load_manifest(os.path.join(output_dir, "manifest.json"))
+    assert all(entry["status"] == "done" for entry in manifest.values())
+    
+    # Reprise: rien à refaire, sauf la vidéo modifiée
+    summary = run_batch(tmp_dir, output_dir, workers=2, verbose=False)
+    assert len(summary["skipped"]) == 2 and not summary["analyzed"]
+    os.utime(second_path, (time.time() + 10, time.time() + 10))
+    summary = run_batch(tmp_dir, output_dir, workers=2, verbose=False)
+    assert summary["analyzed"] == [os.path.abspath(second_path)]
+    shutil.rmtree(tmp_dir)
+    print("✅ test_batch_analysis_resumes passed")
+
+
+def test_adaptive_stride_analysis():
+    """Test du pas adaptatif: frames vides sautées, mêmes vitesses sur le passage de la balle"""
+    tmp_dir, video_path = make_sparse_video()
+    
+    full = analyze_video_headless(video_path, verbose=False)
+    strided = analyze_video_headless(video_path, verbose=False, idle_stride=8)
+    
+    assert full["frames_skipped"] == 0
+    assert strided["frames_skipped"] > 150, f"Trop peu de frames sautées: {strided['frames_skipped']}"
+    assert strided["frames_analyzed"] == full["frames_analyzed"] == 300
+    assert strided["positions_detected"] >= full["positions_detected"] - 8
+    assert abs(strided["max_speed_kmh"] - full["max_speed_kmh"]) < 0.5
+    shutil.rmtree(tmp_dir)
+    print("✅ test_adaptive_stride_analysis passed")
+
+
+def test_motion_gated_analysis():
+    """Test du pré-filtre de mouvement: frames fixes non segmentées, mêmes vitesses"""
+    tmp_dir, video_path = make_sparse_video()
+    
+    full = analyze_video_headless(video_path, verbose=False)
+    gated = analyze_video_headless(video_path, verbose=False, motion_gate=True)
+    
+    for key in ("positions_detected", "max_speed_kmh", "avg_speed_kmh"):
+        assert gated[key] == full[key], f"{key}: {gated[key]} != {full[key]}"
+    assert gated["motion_static_frames"] > 0.7
+    assert gated["motion_skipped_pixels"] > 0.9
+    shutil.rmtree(tmp_dir)
+    print("✅ test_motion_gated_analysis passed")
+
+
+def test_motion_gated_slow_ball():
+    """Test du pré-filtre de mouvement: une balle lente n'est jamais figée"""
+    tmp_dir, video_path = make_slow_ball_video()
+    full_path = os.path.join(tmp_dir, "full.jsonl")
+    gated_path = os.path.join(tmp_dir, "gated.jsonl")
+    
+    full = analyze_video_headless(video_path, verbose=False, tracks_path=full_path)
+    gated = analyze_video_headless(video_path, verbose=False, motion_gate=True, tracks_path=gated_path)
+    
+    assert gated["positions_detected"] == full["positions_detected"]
+    full_records = list(read_records(full_path))
+    gated_records = list(read_records(gated_path))
+    assert [(r["x"], r["y"]) for r in gated_records] == [(r["x"], r["y"]) for r in full_records]
+    assert [r["speed_kmh"] for r in gated_records] == [r["speed_kmh"] for r in full_records]
+    shutil.rmtree(tmp_dir)
+    print("✅ test_motion_gated_slow_ball passed")
+
+
+def test_tracking_output_jsonl():
+    """Test de l'export frame par frame: un enregistrement JSONL par frame analysée"""
+    tmp_dir, video_path = make_test_video(duration_sec=1)
+    tracks_path = os.path.join(tmp_dir, "tracks.jsonl")
+    
+    report = analyze_video_headless(video_path, verbose=False, tracks_path=tracks_path)
+    
+    records = list(read_records(tracks_path))
+    assert len(records) == report["frames_analyzed"] == 30
+    assert [r["frame"] for r in records] == list(range(1, 31))
+    assert set(records[0]) == set(tracking_output.FIELDS)
+    detected = [r for r in records if r["x"] is not None]
+    assert len(detected) >= report["positions_detected"]
+    assert max(r["speed_kmh"] for r in detected) == report["max_speed_kmh"]
+    shutil.rmtree(tmp_dir)
+    print("✅ test_tracking_output_jsonl passed")
+
+
+def test_tracking_output_parquet():
+    """Test de l'export Parquet (nécessite pyarrow, sinon erreur explicite)"""
+    tmp_dir = tempfile.mkdtemp()
+    path = os.path.join(tmp_dir, "tracks.parquet")
+    if tracking_output.pa is None:
+        try:
+            TrackingWriter(path)
+            assert False, "ImportError attendue sans pyarrow"
+        except ImportError:
+            pass
+    else:
+        writer = TrackingWriter(path, batch_size=2)
+        for i in range(5):
+            writer.write({"frame": i, "timestamp": i / 30, "x": i, "y": None, "radius": 10,
+                          "speed_kmh": None, "num_contours": 1, "action": None, "confidence": None})
+        writer.close()
+        assert [r["frame"] for r in read_records(path)] == list(range(5))
+    shutil.rmtree(tmp_dir)
+    print("✅ test_tracking_output_parquet passed")
+
+
+def test_detection_cache():
+    """Test du cache de détections: relecture à paramètres identiques, calibration libre"""
+    tmp_dir, video_path = make_test_video(duration_sec=1)
+    cache = DetectionCache(os.path.join(tmp_dir, "cache"))
+    
+    first = analyze_video_headless(video_path, verbose=False, cache=cache)
+    again = analyze_video_headless(video_path, verbose=False, cache=cache)
+    recalibrated = analyze_video_headless(video_path, verbose=False, cache=cache, pixels_per_meter=50)
+    other_profile = analyze_video_headless(video_path, verbose=False, cache=cache, color_profile="jaune")
+    
+    assert not first["from_cache"] and again["from_cache"] and recalibrated["from_cache"]
+    assert not other_profile["from_cache"], "Des seuils différents ne doivent pas réutiliser le cache"
+    for key in ("frames_analyzed", "positions_detected", "max_speed_kmh", "avg_speed_kmh"):
+        assert again[key] == first[key], f"{key}: {again[key]} != {first[key]}"
+    assert abs(recalibrated["max_speed_kmh"] - 2 * first["max_speed_kmh"]) < 1e-6
+    assert (cache.hits, cache.misses) == (2, 2)
+    shutil.rmtree(tmp_dir)
+    print("✅ test_detection_cache passed")
+
+
+def test_detection_cache_corrupt_entries():
+    """Test du cache: entrée tronquée ou incomplète = absente (supprimée), pas d'erreur"""
+    tmp_dir = tempfile.mkdtemp()
+    cache = DetectionCache(os.path.join(tmp_dir, "cache"))
+    cache.put("complete", [1, 2], [(10, 20, 5), None], [1, 0], 2, 30.0)
+    with open(cache.path("complete"), 'rb') as f:
+        content = f.read()
+    with open(cache.path("truncated"), 'wb') as f:
+        f.write(content[:len(content) // 2])
+    np.savez_compressed(cache.path("incomplete"), frames=np.array([1]), positions=np.zeros((1, 3)))
+    
+    assert cache.get("complete") is not None
+    for key in ("truncated", "incomplete"):
+        assert cache.get(key) is None
+        assert not os.path.exists(cache.path(key))
+    assert (cache.hits, cache.misses) == (1, 2)
+    shutil.rmtree(tmp_dir)
+    print("✅ test_detection_cache_corrupt_entries passed")
+
+
+def test_detection_cache_key_params():
+    """Test de la clé du cache: tout réglage qui change les détections change la clé"""
+    tracker = BallTracker(color_profile="orange")
+    reference = detector_params(tracker)
+    changes = [
+        lambda t: setattr(t, "roi_margin", 80),
+        lambda t: setattr(t, "roi_max_misses", 3),
+        lambda t: setattr(t, "pyramid_min_radius", 8),
+        lambda t: setattr(t, "max_gap_frames", 2),
+        lambda t: setattr(t.kalman, "gate_threshold", 9.2),
+        lambda t: setattr(t.kalman, "process_noise", 1e5),
+        lambda t: setattr(t.color_lut, "bits", 5),
+        lambda t: setattr(t, "motion_gate", MotionDetector()),
+    ]
+    for change in changes:
+        tracker = BallTracker(color_profile="orange")
+        change(tracker)
+        assert detector_params(tracker) != reference
+    
+    tracker = BallTracker(color_profile="orange")
+    tracker.motion_gate = MotionDetector()
+    gated = detector_params(tracker)
+    tracker.motion_gate.threshold = 40
+    assert detector_params(tracker) != gated
+    print("✅ test_detection_cache_key_params passed")
+
+
+def test_detection_cache_eviction():
+    """Test de l'éviction LRU: les entrées les moins récemment lues partent en premier"""
+    tmp_dir = tempfile.mkdtemp()
+    cache = DetectionCache(tmp_dir)
+    for i, key in enumerate(("a", "b", "c")):
+        cache.put(key, range(100), [(i, i, i)] * 100, [1] * 100, 100, 30.0)
+        os.utime(cache.path(key), (1000 + i, 1000 + i))
+    
+    assert cache.get("a") is not None  # "a" devient la plus récente
+    cache.max_bytes = os.path.getsize(cache.path("a")) + os.path.getsize(cache.path("c"))
+    cache.evict()
+    assert sorted(os.listdir(tmp_dir)) == ["a.npz", "c.npz"]
+    shutil.rmtree(tmp_dir)
+    print("✅ test_detection_cache_eviction passed")
+
+
+def test_recalibrate_tracks():
+    """Test du recalcul depuis les résultats frame par frame: même résultat qu'une réanalyse"""
+    tmp_dir, video_path = make_test_video(duration_sec=2)
+    tracks_path = os.path.join(tmp_dir, "tracks.jsonl")
+    
+    analyze_video_headless(video_path, verbose=False, tracks_path=tracks_path)
+    reanalyzed = analyze_video_headless(video_path, verbose=False, pixels_per_meter=57)
+    summary = recalibrate_tracks(tracks_path, 57)
+    
+    assert summary["positions_detected"] == reanalyzed["positions_detected"]
+    assert summary["max_speed_kmh"] == reanalyzed["max_speed_kmh"]
+    assert abs(summary["avg_speed_kmh"] - reanalyzed["avg_speed_kmh"]) < 1e-9
+    shutil.rmtree(tmp_dir)
+    print("✅ test_recalibrate_tracks passed")
+
+
+def run_all_tests():
+    """Exécute tous les tests"""
+    print("\n🧪 Lancement des tests d'analyse vidéo")
+    print("=" * 60)
+    
+    try:
+        test_headless_analysis_report()
+        test_headless_analysis_with_output()
+        test_headless_analysis_missing_file()
+        test_pipeline_preserves_order()
+        test_pipeline_propagates_errors()
+        test_pipelined_analysis_matches_sequential()
+        test_parallel_analysis_matches_sequential()
+        test_parallel_analysis_ball_missing_at_boundary()
+        test_parallel_cli_rejects_unsupported_options()
+        test_batch_analysis_resumes()
+        test_adaptive_stride_analysis()
+        test_motion_gated_analysis()
+        test_motion_gated_slow_ball()
+        test_tracking_output_jsonl()
+        test_tracking_output_parquet()
+        test_detection_cache()
+        test_detection_cache_corrupt_entries()
+        test_detection_cache_key_params()
+        test_detection_cache_eviction()
+        test_recalibrate_tracks()
+        
+        print("=" * 60)
+        print("✅ Tous les tests sont passés avec succès!")
+        print("=" * 60)
+        return True
+    
+    except AssertionError as e:
+        print(f"\n❌ Test échoué: {e}")
+        return False
+    except Exception as e:
+        print(f"\n❌ Erreur inattendue: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    exit(0 if success else 1)
@@ -0,0 +1,151 @@
+"""
+Export des résultats de suivi frame par frame
+Chaque frame analysée devient un enregistrement (frame, instant, balle, vitesse,
+contours, action) écrit au fil de l'eau en JSON Lines, ou en Parquet si pyarrow
+est installé: la mémoire reste bornée quelle que soit la durée de la vidéo et
+les analyses ultérieures n'ont pas à relancer la détection
+"""
+import json
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Colonnes d'un enregistrement, dans l'ordre
+FIELDS = ("frame", "timestamp", "x", "y", "radius", "speed_kmh", "num_contours", "action", "confidence")
+
+
+def tracking_record(tracker, frame_number, timestamp, position, action=None, confidence=None,
+                    num_contours=None):
+    """
+    Construit l'enregistrement d'une frame à partir de l'état d'un BallTracker
+    position: (x, y, radius) retourné par update, ou None si la balle n'est pas vue
+    num_contours: nombre de contours, None pour celui de la dernière détection du tracker
+    """
+    x, y, radius = (int(v) for v in position) if position is not None else (None, None, None)
+    detection = tracker.last_detection
+    if num_contours is None:
+        num_contours = detection.num_contours if detection is not None else 0
+    return {
+        "frame": frame_number,
+        "timestamp": timestamp,
+        "x": x,
+        "y": y,
+        "radius": radius,
+        "speed_kmh": float(tracker.speed_kmh) if position is not None else None,
+        "num_contours": num_contours,
+        "action": action,
+        "confidence": confidence,
+    }
+
+
+class TrackingWriter:
+    def __init__(self, path, format=None, batch_size=1000):
+        """
+        Ouvre le fichier de sortie
+        path: fichier .jsonl ou .parquet
+        format: "jsonl" ou "parquet" (None = d'après l'extension)
+        batch_size: nombre d'enregistrements par groupe de lignes Parquet
+        """
+        if format is None:
+            format = "parquet" if path.lower().endswith(".parquet") else "jsonl"
+        if format not in ("jsonl", "parquet"):
+            raise ValueError(f"Format inconnu: {format} (jsonl ou parquet)")
+        if format == "parquet" and pa is None:
+            raise ImportError("L'export Parquet nécessite pyarrow (pip install pyarrow)")
+        
+        self.path = path
+        self.format = format
+        self.batch_size = batch_size
+        self.count = 0
+        
+        self.file = None
+        self.parquet_writer = None
+        self.batch = []
+        if format == "jsonl":
+            self.file = open(path, 'w', encoding='utf-8')
+    
+    def write(self, record):
+        """
+        Ajoute l'enregistrement d'une frame (dict avec les clés de FIELDS)
+        """
+        self.count += 1
+        if self.file is not None:
+            self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            return
+        
+        self.batch.append(record)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+    
+    def flush(self):
+        """
+        Écrit le groupe d'enregistrements Parquet en attente
+        """
+        if self.file is not None:
+            self.file.flush()
+            return
+        if not self.batch:
+            return
+        
+        table = pa.Table.from_pydict({name: [record.get(name) for record in self.batch] for name in FIELDS},
+                                     schema=_parquet_schema())
+        if self.parquet_writer is None:
+            self.parquet_writer = pq.ParquetWriter(self.path, table.schema)
+        self.parquet_writer.write_table(table)
+        self.batch = []
+    
+    def close(self):
+        """
+        Termine l'écriture et ferme le fichier
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            return
+        
+        self.flush()
+        if self.parquet_writer is None:
+            # Aucun enregistrement: fichier Parquet vide mais valide
+            pq.write_table(pa.Table.from_pydict({name: [] for name in FIELDS}, schema=_parquet_schema()),
+                           self.path)
+        else:
+            self.parquet_writer.close()
+            self.parquet_writer = None
+
+
+def _parquet_schema():
+    """
+    Schéma Parquet des enregistrements (colonnes nullables)
+    """
+    return pa.schema([
+        ("frame", pa.int64()),
+        ("timestamp", pa.float64()),
+        ("x", pa.int32()),
+        ("y", pa.int32()),
+        ("radius", pa.int32()),
+        ("speed_kmh", pa.float64()),
+        ("num_contours", pa.int32()),
+        ("action", pa.string()),
+        ("confidence", pa.float64()),
+    ])
+
+
+def read_records(path):
+    """
+    Relit les enregistrements d'un fichier JSONL ou Parquet (générateur de dicts)
+    """
+    if path.lower().endswith(".parquet"):
+        if pq is None:
+            raise ImportError("La lecture Parquet nécessite pyarrow (pip install pyarrow)")
+        for batch in pq.ParquetFile(path).iter_batches():
+            yield from batch.to_pylist()
+        return
+    
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,115 @@
+"""
+Pipeline vidéo en trois étages: décodage, analyse et encodage
+Le décodage (cap.read) et l'encodage (writer.write) tournent dans leurs propres
+threads, reliés à l'analyse par des files bornées: les trois étages se
+recouvrent (OpenCV libère le GIL) tout en gardant l'ordre des frames, et une
+file pleine bloque l'étage précédent (pas d'accumulation en mémoire)
+"""
+import queue
+import threading
+
+# Marqueur de fin de flux
+_END = object()
+
+
+def _put(q, item, stop_event):
+    """
+    Dépose un élément dans une file bornée, abandonne si le pipeline est arrêté
+    """
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q, stop_event):
+    """
+    Récupère un élément, ou _END si le pipeline est arrêté
+    """
+    while True:
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            if stop_event.is_set():
+                return _END
+
+
+def run_pipeline(cap, process_frame, writer=None, queue_size=8):
+    """
+    Lit toutes les frames de cap, les analyse dans le thread appelant et
+    écrit les frames retournées dans writer, dans l'ordre
+    cap: objet avec read() -> (ret, frame) (cv2.VideoCapture)
+    process_frame: fonction (frame_number, frame) -> frame à écrire ou None;
+                   la frame appartient à process_frame, qui peut l'annoter
+                   sur place avant de la transmettre à l'encodeur
+    writer: objet avec write(frame) (cv2.VideoWriter) ou None
+    queue_size: taille maximale de chaque file entre deux étages
+    Retourne le nombre de frames analysées
+    Une exception levée dans un étage arrête le pipeline et est relancée ici
+    """
+    decoded = queue.Queue(maxsize=queue_size)
+    encoded = queue.Queue(maxsize=queue_size)
+    stop_event = threading.Event()
+    errors = []
+    
+    def decode():
+        frame_number = 0
+        try:
+            while not stop_event.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                frame_number += 1
+                if not _put(decoded, (frame_number, frame), stop_event):
+                    return
+        except Exception as e:
+            errors.append(e)
+            stop_event.set()
+        finally:
+            _put(decoded, _END, stop_event)
+    
+    def encode():
+        try:
+            while True:
+                frame = _get(encoded, stop_event)
+                if frame is _END:
+                    break
+                writer.write(frame)
+        except Exception as e:
+            errors.append(e)
+            stop_event.set()
+    
+    decoder = threading.Thread(target=decode, name="video-decoder", daemon=True)
+    encoder = threading.Thread(target=encode, name="video-encoder", daemon=True)
+    decoder.start()
+    if writer is not None:
+        encoder.start()
+    
+    frames_processed = 0
+    try:
+        while True:
+            item = _get(decoded, stop_event)
+            if item is _END:
+                break
+            frame_number, frame = item
+            result = process_frame(frame_number, frame)
+            frames_processed += 1
+            if writer is not None and result is not None:
+                if not _put(encoded, result, stop_event):
+                    break
+    except Exception:
+        stop_event.set()
+        raise
+    finally:
+        if writer is not None:
+            _put(encoded, _END, stop_event)
+            encoder.join()
+        stop_event.set()
+        decoder.join()
+    
+    if errors:
+        raise errors[0]
+    return frames_processed